@@ -0,0 +1,88 @@
+import time
+
+
+class Tween(object):
+    """
+    Animation that calls apply(fraction) with fraction going from 0 to 1.
+
+    The fraction is computed from wall-clock time, so the animation takes
+    `duration` seconds no matter how many frames the renderer manages; frames
+    that cannot be rendered in time are simply skipped. `delay` postpones the
+    start relative to when the tween is added to a scheduler.
+    """
+
+    def __init__(self, duration, apply, delay=0.0, easing=None):
+        self.duration = duration
+        self.apply = apply
+        self.delay = delay
+        self.easing = easing
+        self.startTime = None
+
+    def start(self, now):
+        self.startTime = now + self.delay
+
+    def sample(self, elapsed):
+        if elapsed < 0.0:
+            return False
+        fraction = min(elapsed / self.duration, 1.0) if self.duration > 0 else 1.0
+        self.apply(self.easing(fraction) if self.easing else fraction)
+        return fraction >= 1.0
+
+    def step(self, now):
+        """
+        Apply the state for time `now`; returns True once the tween has finished.
+        """
+        return self.sample(now - self.startTime)
+
+
+class AnimationScheduler(object):
+    """
+    Runs animations from vtkRenderWindowInteractor timer events.
+
+    Every tick steps all running animations to the current time and renders
+    once, so any number of animations run concurrently and event handling is
+    never blocked. The timer only runs while there is something to animate.
+    The interactor must be initialized before animations are added.
+    """
+
+    def __init__(self, interactor, fps=30.0):
+        self.interactor = interactor
+        self.interval = 1.0 / fps
+        self.animations = []
+        self.timerId = None
+        self.lastFrameTime = None
+        self.droppedFrames = 0
+        self.interactor.AddObserver("TimerEvent", self.onTimer)
+
+    def add(self, animation):
+        animation.start(time.perf_counter())
+        self.animations.append(animation)
+        if self.timerId is None:
+            self.timerId = self.interactor.CreateRepeatingTimer(
+                max(1, int(self.interval * 1000))
+            )
+        return animation
+
+    def remove(self, animation):
+        if animation in self.animations:
+            self.animations.remove(animation)
+
+    def onTimer(self, obj, event):
+        if self.timerId is None or obj.GetTimerEventId() != self.timerId:
+            return
+
+        now = time.perf_counter()
+        if self.lastFrameTime is not None:
+            # Count the frames skipped because rendering fell behind
+            self.droppedFrames += max(0, int((now - self.lastFrameTime) / self.interval) - 1)
+        self.lastFrameTime = now
+
+        for animation in list(self.animations):
+            if animation.step(now):
+                self.animations.remove(animation)
+        self.interactor.Render()
+
+        if not self.animations:
+            self.interactor.DestroyTimer(self.timerId)
+            self.timerId = None
+            self.lastFrameTime = None
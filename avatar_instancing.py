@@ -0,0 +1,161 @@
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkRenderingCore import vtkActor, vtkGlyph3DMapper
+
+from geometry_cache import geometry_cache
+
+
+def matrices_to_quaternions(rotations):
+    """
+    Convert (N, 3, 3) rotation matrices to (N, 4) quaternions in (w, x, y, z) order.
+    """
+    m = rotations
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    q = np.empty((len(m), 4))
+
+    # Branch on the largest diagonal term per row for stability (Shepperd's method)
+    diag = np.stack([trace, m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], axis=1)
+    case = np.argmax(diag, axis=1)
+
+    c = case == 0
+    s = np.sqrt(np.maximum(1.0 + trace[c], 1e-12)) * 2.0
+    q[c, 0] = 0.25 * s
+    q[c, 1] = (m[c, 2, 1] - m[c, 1, 2]) / s
+    q[c, 2] = (m[c, 0, 2] - m[c, 2, 0]) / s
+    q[c, 3] = (m[c, 1, 0] - m[c, 0, 1]) / s
+
+    c = case == 1
+    s = np.sqrt(np.maximum(1.0 + m[c, 0, 0] - m[c, 1, 1] - m[c, 2, 2], 1e-12)) * 2.0
+    q[c, 0] = (m[c, 2, 1] - m[c, 1, 2]) / s
+    q[c, 1] = 0.25 * s
+    q[c, 2] = (m[c, 0, 1] + m[c, 1, 0]) / s
+    q[c, 3] = (m[c, 0, 2] + m[c, 2, 0]) / s
+
+    c = case == 2
+    s = np.sqrt(np.maximum(1.0 + m[c, 1, 1] - m[c, 0, 0] - m[c, 2, 2], 1e-12)) * 2.0
+    q[c, 0] = (m[c, 0, 2] - m[c, 2, 0]) / s
+    q[c, 1] = (m[c, 0, 1] + m[c, 1, 0]) / s
+    q[c, 2] = 0.25 * s
+    q[c, 3] = (m[c, 1, 2] + m[c, 2, 1]) / s
+
+    c = case == 3
+    s = np.sqrt(np.maximum(1.0 + m[c, 2, 2] - m[c, 0, 0] - m[c, 1, 1], 1e-12)) * 2.0
+    q[c, 0] = (m[c, 1, 0] - m[c, 0, 1]) / s
+    q[c, 1] = (m[c, 0, 2] + m[c, 2, 0]) / s
+    q[c, 2] = (m[c, 1, 2] + m[c, 2, 1]) / s
+    q[c, 3] = 0.25 * s
+    return q
+
+
+class InstancedAvatar(object):
+    """
+    Draws every avatar part as an instance of a vtkGlyph3DMapper.
+
+    Each instance has a 4x4 matrix in `matrices`, an RGB color in `colors` and a
+    shape index into the list of glyph sources. To pose the avatar, write the
+    matrices and call Modified(); there is one actor and one mapper in total.
+    """
+
+    def __init__(self, sourcePorts, shapeIndex, colors=None):
+        n = len(shapeIndex)
+        self.matrices = np.tile(np.eye(4), (n, 1, 1))
+        self.colors = np.full((n, 3), 255, dtype=np.uint8)
+        if colors is not None:
+            self.colors[:] = colors
+
+        # The VTK arrays below wrap these NumPy buffers without copying
+        self._positions = np.zeros((n, 3))
+        self._orientations = np.zeros((n, 4))
+        self._orientations[:, 0] = 1.0
+        self._scales = np.ones((n, 3))
+        self._shapeIndex = np.ascontiguousarray(shapeIndex, dtype=np.int32)
+
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(self._positions, deep=False))
+        self.polydata = vtkPolyData()
+        self.polydata.SetPoints(points)
+        pointData = self.polydata.GetPointData()
+        for name, array in (
+            ("Orientation", self._orientations),
+            ("Scale", self._scales),
+            ("ShapeIndex", self._shapeIndex),
+        ):
+            vtkArray = numpy_to_vtk(array, deep=False)
+            vtkArray.SetName(name)
+            pointData.AddArray(vtkArray)
+        vtkColors = numpy_to_vtk(self.colors, deep=False)
+        vtkColors.SetName("Colors")
+        pointData.SetScalars(vtkColors)
+
+        self.mapper = vtkGlyph3DMapper()
+        self.mapper.SetInputData(self.polydata)
+        for i, port in enumerate(sourcePorts):
+            self.mapper.SetSourceConnection(i, port)
+        self.mapper.SourceIndexingOn()
+        self.mapper.SetSourceIndexArray("ShapeIndex")
+        self.mapper.SetOrientationModeToQuaternion()
+        self.mapper.SetOrientationArray("Orientation")
+        self.mapper.SetScaleModeToScaleByVectorComponents()
+        self.mapper.SetScaleArray("Scale")
+        self.mapper.ScalingOn()
+        self.mapper.SetColorModeToDirectScalars()
+        self.mapper.ScalarVisibilityOn()
+
+        self.actor = vtkActor()
+        self.actor.SetMapper(self.mapper)
+
+    def __len__(self):
+        return len(self.matrices)
+
+    def Modified(self):
+        """
+        Push `matrices` and `colors` to the glyph mapper.
+        """
+        linear = self.matrices[:, :3, :3]
+        self._positions[:] = self.matrices[:, :3, 3]
+        self._scales[:] = np.linalg.norm(linear, axis=1)
+        self._orientations[:] = matrices_to_quaternions(linear / self._scales[:, None, :])
+
+        pointData = self.polydata.GetPointData()
+        self.polydata.GetPoints().Modified()
+        pointData.GetArray("Orientation").Modified()
+        pointData.GetArray("Scale").Modified()
+        pointData.GetScalars().Modified()
+        self.polydata.Modified()
+
+    def update_from_actors(self, actors):
+        """
+        Copy the current matrices of per-part actors into the instance array.
+        """
+        for i, actor in enumerate(actors):
+            matrix = actor.GetMatrix()
+            for row in range(4):
+                for column in range(4):
+                    self.matrices[i, row, column] = matrix.GetElement(row, column)
+        self.Modified()
+
+    @classmethod
+    def from_actors(cls, actors):
+        """
+        Build instances from actors whose mappers come from the geometry cache.
+        """
+        cached = {id(mapper) for mapper in geometry_cache.values()}
+        sourcePorts = []
+        portIndex = {}
+        shapeIndex = []
+        colors = []
+        for actor in actors:
+            mapper = actor.GetMapper()
+            if id(mapper) not in cached:
+                raise ValueError("actor mapper is not in the geometry cache")
+            if id(mapper) not in portIndex:
+                portIndex[id(mapper)] = len(sourcePorts)
+                sourcePorts.append(mapper.GetInputConnection(0, 0))
+            shapeIndex.append(portIndex[id(mapper)])
+            colors.append(np.round(np.array(actor.GetProperty().GetColor()) * 255))
+
+        instances = cls(sourcePorts, shapeIndex, colors)
+        instances.update_from_actors(actors)
+        return instances
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Render the avatar pose sequence or a scripted hand animation offscreen.
+
+The frame range is split into contiguous chunks that a multiprocessing pool
+renders in parallel; every worker builds the scene once in its own offscreen
+vtkRenderWindow. Frames are written as PNG files or raw RGB (top row first,
+uint8, width x height x 3) together with a frames.json description.
+
+    python batch_render.py avatar --frames 0:60 --fps 30 --out frames
+    python batch_render.py hand --script curl.json --workers 8 --format raw
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkRenderingCore import vtkRenderWindow, vtkWindowToImageFilter
+
+# Default hand script: curl each finger in turn, base to tip.
+# Entries are {"part": finger_actors key, "start": s, "duration": s, "direction": +-1}.
+DEFAULT_HAND_SCRIPT = [
+    {"part": "%s_phalanx%d" % (finger, joint), "start": 0.4 * i, "duration": 0.75, "direction": 1}
+    for i, finger in enumerate(["thumb", "index", "middle", "ring", "pinky"])
+    for joint in (1, 2, 3)
+]
+
+# Per-process scene state, created by init_worker()
+_scene = {}
+
+
+class AvatarScene(object):
+    size = (500, 700)
+
+    def __init__(self, options):
+        avatar = importlib.import_module("03Avatar")
+        self.applyPose = avatar.apply_pose
+        renderer, self.skeleton = avatar.create_avatarRenderer(
+            options.get("skeleton"), instanced=options.get("instanced", False), lod=options.get("lod", False)
+        )
+        # Frame the final pose so the camera does not move between frames
+        self.applyPose(self.skeleton, float("inf"))
+        renderer.ResetCamera()
+        self.renderers = [renderer]
+
+    def pose(self, t):
+        self.applyPose(self.skeleton, t)
+
+
+class HandScene(object):
+    size = (1200, 600)
+
+    def __init__(self, options):
+        self.hand = importlib.import_module("hand")
+        self.renderers = list(self.hand.create_renderers(vtkNamedColors()))
+        self.script = DEFAULT_HAND_SCRIPT
+        if options.get("script"):
+            with open(options["script"]) as f:
+                self.script = json.load(f)
+
+    def pose(self, t):
+        for entry in self.script:
+            elapsed = t - entry["start"]
+            fraction = min(max(elapsed / entry["duration"], 0.0), 1.0)
+            self.hand.rotate_phalanx(
+                self.hand.finger_transforms[entry["part"]],
+                entry["part"],
+                entry.get("direction", 1),
+                fraction,
+            )
+
+
+SCENES = {"avatar": AvatarScene, "hand": HandScene}
+
+
+def init_worker(sceneName, options):
+    scene = SCENES[sceneName](options)
+    renderWindow = vtkRenderWindow()
+    renderWindow.SetOffScreenRendering(1)
+    renderWindow.SetSize(*options.get("size") or scene.size)
+    for renderer in scene.renderers:
+        renderWindow.AddRenderer(renderer)
+    grabber = vtkWindowToImageFilter()
+    grabber.SetInput(renderWindow)
+    grabber.ReadFrontBufferOff()
+    _scene.update(scene=scene, window=renderWindow, grabber=grabber, options=options)
+
+
+def render_frames(frames):
+    scene, renderWindow, grabber = _scene["scene"], _scene["window"], _scene["grabber"]
+    options = _scene["options"]
+    for frame in frames:
+        scene.pose(frame / options["fps"])
+        renderWindow.Render()
+        grabber.Modified()
+        grabber.Update()
+        path = os.path.join(options["out"], "frame_%05d.%s" % (frame, options["format"]))
+        if options["format"] == "png":
+            writer = vtkPNGWriter()
+            writer.SetFileName(path)
+            writer.SetInputData(grabber.GetOutput())
+            writer.Write()
+        else:
+            image = grabber.GetOutput()
+            width, height, _ = image.GetDimensions()
+            pixels = vtk_to_numpy(image.GetPointData().GetScalars()).reshape(height, width, -1)
+            pixels[::-1, :, :3].tofile(path)
+    return len(frames)
+
+
+def chunk_frames(frames, workers):
+    # A few chunks per worker keeps the pool balanced without losing locality
+    size = max(1, -(-len(frames) // (workers * 4)))
+    return [frames[i : i + size] for i in range(0, len(frames), size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("scene", choices=sorted(SCENES))
+    parser.add_argument("--frames", default="0:60", help="frame range start:stop (stop excluded)")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--out", default="frames")
+    parser.add_argument("--format", choices=("png", "raw"), default="png")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--size", help="window size WIDTHxHEIGHT")
+    parser.add_argument("--skeleton", help="avatar rig JSON file")
+    parser.add_argument("--instanced", action="store_true", help="render the avatar with glyph instancing")
+    parser.add_argument("--lod", action="store_true", help="switch avatar tessellation by screen size")
+    parser.add_argument("--script", help="hand animation script JSON file")
+    args = parser.parse_args(argv)
+
+    start, stop = (int(value) for value in args.frames.split(":"))
+    frames = list(range(start, stop))
+    options = {
+        "fps": args.fps,
+        "out": args.out,
+        "format": args.format,
+        "size": tuple(int(value) for value in args.size.split("x")) if args.size else None,
+        "skeleton": args.skeleton,
+        "instanced": args.instanced,
+        "lod": args.lod,
+        "script": args.script,
+    }
+    os.makedirs(args.out, exist_ok=True)
+
+    workers = max(1, min(args.workers, len(frames)))
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=(args.scene, options)) as pool:
+        rendered = sum(pool.imap_unordered(render_frames, chunk_frames(frames, workers)))
+
+    width, height = options["size"] or SCENES[args.scene].size
+    with open(os.path.join(args.out, "frames.json"), "w") as f:
+        json.dump(
+            {"scene": args.scene, "frames": [start, stop], "fps": args.fps, "format": args.format,
+             "width": width, "height": height},
+            f,
+            indent=4,
+        )
+    print("rendered %d frames to %s" % (rendered, args.out))
+
+
+if __name__ == "__main__":
+    main()
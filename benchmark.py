@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+Offscreen benchmark of every demo scene.
+
+Each scene is built from its script's scene builder (no interactor is
+started) in a fresh process, rendered offscreen and timed:
+
+    build_ms      importing the script and constructing its actors and renderers
+    update_ms     Update() of every mapper's input pipeline
+    first_frame_ms  the first Render(), including shader compilation and upload
+    frame_ms      steady-state frames while the camera orbits the scene
+
+Software OpenGL is requested unless --hardware is given. Results are written
+as JSON; pass --baseline with an earlier result to print the ratios. With
+--import-budget the cold import time of each scene's script is measured too
+(see import_profile.py), and the run fails when one exceeds the budget.
+
+    python benchmark.py --out bench.json
+    python benchmark.py avatar hand --frames 200 --baseline bench.json
+    python benchmark.py --import-budget 1500
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+import import_profile
+
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkVersion
+from vtkmodules.vtkRenderingCore import vtkRenderer, vtkRenderWindow, vtkRenderWindowInteractor
+
+SCENES = {}
+
+
+def scene(name, size, script):
+    def register(build):
+        SCENES[name] = (build, size, script)
+        return build
+
+    return register
+
+
+def load_script(filename):
+    # Script names such as "03Avatar" or "com.pipe" are not importable by name
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0].replace(".", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@scene("avatar", (500, 700), "03Avatar.py")
+def build_avatar(renderWindow, colors):
+    renderer, _ = load_script("03Avatar.py").create_avatarRenderer()
+    renderWindow.AddRenderer(renderer)
+
+
+@scene("hand", (600, 600), "hand.py")
+def build_hand(renderWindow, colors):
+    renderer = vtkRenderer()
+    for actor in load_script("hand.py").create_hand_actors(colors):
+        renderer.AddActor(actor)
+    renderWindow.AddRenderer(renderer)
+
+
+@scene("quadric", (600, 600), "hand.py")
+def build_quadric(renderWindow, colors):
+    renderer = vtkRenderer()
+    for actor in load_script("hand.py").create_quadric_visualization(colors):
+        renderer.AddActor(actor)
+    renderWindow.AddRenderer(renderer)
+
+
+@scene("com_pipe", (1200, 600), "com.pipe.py")
+def build_com_pipe(renderWindow, colors):
+    for renderer in load_script("com.pipe.py").create_renderers(colors):
+        renderWindow.AddRenderer(renderer)
+
+
+@scene("arm", (640, 480), "pipe_0319.py")
+def build_arm(renderWindow, colors):
+    renderWindow.AddRenderer(load_script("pipe_0319.py").create_arm_renderer())
+
+
+@scene("cone", (300, 300), "test.py")
+def build_cone(renderWindow, colors):
+    test = load_script("test.py")
+    renderer, coneActor = test.create_cone_renderer(colors)
+    renderWindow.AddRenderer(renderer)
+    # The box widget needs an interactor, which is never started
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(renderWindow)
+    return test.create_box_widget(interactor, coneActor, colors)
+
+
+def renderers_of(renderWindow):
+    renderers = renderWindow.GetRenderers()
+    renderers.InitTraversal()
+    return [renderers.GetNextItem() for _ in range(renderers.GetNumberOfItems())]
+
+
+def update_pipelines(renderWindow):
+    for renderer in renderers_of(renderWindow):
+        actors = renderer.GetActors()
+        actors.InitTraversal()
+        for _ in range(actors.GetNumberOfItems()):
+            mapper = actors.GetNextActor().GetMapper()
+            if mapper is not None and mapper.GetNumberOfInputPorts() and mapper.GetInputAlgorithm():
+                mapper.GetInputAlgorithm().Update()
+
+
+def opengl_renderer(renderWindow):
+    for line in renderWindow.ReportCapabilities().splitlines():
+        if line.startswith("OpenGL renderer string:"):
+            return line.split(":", 1)[1].strip()
+    return ""
+
+
+def run_scene(name, frames, size=None):
+    build, defaultSize, _ = SCENES[name]
+    renderWindow = vtkRenderWindow()
+    renderWindow.SetOffScreenRendering(1)
+    renderWindow.SetSize(*(size or defaultSize))
+
+    start = time.perf_counter()
+    keepAlive = build(renderWindow, vtkNamedColors())
+    built = time.perf_counter()
+    update_pipelines(renderWindow)
+    updated = time.perf_counter()
+    renderWindow.Render()
+    rendered = time.perf_counter()
+
+    cameras = [renderer.GetActiveCamera() for renderer in renderers_of(renderWindow)]
+    times = np.empty(frames)
+    for i in range(frames):
+        for camera in cameras:
+            camera.Azimuth(360.0 / frames)
+        frameStart = time.perf_counter()
+        renderWindow.Render()
+        renderWindow.WaitForCompletion()
+        times[i] = time.perf_counter() - frameStart
+    del keepAlive
+
+    times *= 1000.0
+    return {
+        "build_ms": 1000.0 * (built - start),
+        "update_ms": 1000.0 * (updated - built),
+        "first_frame_ms": 1000.0 * (rendered - updated),
+        "frame_ms": {
+            "mean": float(times.mean()),
+            "p50": float(np.percentile(times, 50)),
+            "p95": float(np.percentile(times, 95)),
+            "max": float(times.max()),
+        },
+        "fps": float(1000.0 / times.mean()),
+        "opengl": opengl_renderer(renderWindow),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    print("%-10s %-16s %10s %10s %7s" % ("scene", "metric", "baseline", "current", "ratio"))
+    for name, current in results["scenes"].items():
+        previous = baseline.get("scenes", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("build_ms", "update_ms", "first_frame_ms"):
+            print("%-10s %-16s %10.2f %10.2f %7.2f" % (
+                name, metric, previous[metric], current[metric], current[metric] / max(previous[metric], 1e-9)))
+        old, new = previous["frame_ms"]["p50"], current["frame_ms"]["p50"]
+        print("%-10s %-16s %10.2f %10.2f %7.2f" % (name, "frame_ms p50", old, new, new / max(old, 1e-9)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("scenes", nargs="*", help="scenes to run: %s (default: all)" % ", ".join(sorted(SCENES)))
+    parser.add_argument("--frames", type=int, default=100, help="steady-state frames per scene")
+    parser.add_argument("--size", help="window size WIDTHxHEIGHT (default: each script's size)")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier result JSON to compare against")
+    parser.add_argument("--hardware", action="store_true", help="do not request software OpenGL")
+    parser.add_argument("--import-budget", type=float, help="fail when a scene's script imports slower than this (ms)")
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.scenes) - set(SCENES))
+    if unknown:
+        parser.error("unknown scene(s): %s" % ", ".join(unknown))
+
+    if not args.hardware:
+        # Read by Mesa when the workers create their OpenGL contexts
+        os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+        os.environ.setdefault("GALLIUM_DRIVER", "llvmpipe")
+    size = tuple(int(value) for value in args.size.split("x")) if args.size else None
+
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "vtk": vtkVersion.GetVTKVersion(),
+        "frames": args.frames,
+        "scenes": {},
+    }
+    # One process per scene, so caches and GL state never leak between scenes
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenes or sorted(SCENES):
+        with context.Pool(1) as pool:
+            results["scenes"][name] = pool.apply(run_scene, (name, args.frames, size))
+        stats = results["scenes"][name]
+        print("%-10s build %8.2f  update %8.2f  first %8.2f  frame p50 %7.2f ms" % (
+            name, stats["build_ms"], stats["update_ms"], stats["first_frame_ms"], stats["frame_ms"]["p50"]))
+
+    if args.import_budget:
+        results["import_ms"] = {}
+        for script in sorted({SCENES[name][2] for name in args.scenes or SCENES}):
+            results["import_ms"][script] = import_profile.profile(script)["load_ms"]
+            print("%-28s import %8.2f ms" % (script, results["import_ms"][script]))
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+    if args.import_budget:
+        over = [script for script, ms in results["import_ms"].items() if ms > args.import_budget]
+        if over:
+            parser.exit(1, "import budget of %.0f ms exceeded by %s\n" % (args.import_budget, ", ".join(over)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Min-max brick index for skipping empty regions of a volume while contouring.
+
+The cells of a volume are grouped into bricks of BRICK_SIZE^3 cells and the
+index stores the smallest and largest point scalar of every brick (a brick
+includes the points on its far faces, so its range covers all of its
+cells). A brick can only contain the isosurface of v when min <= v <= max.
+
+BrickedContourFilter contours each isovalue over the active bricks only:
+they are merged into boxes, and every box is copied out of the volume and
+contoured with vtkFlyingEdges3D. Normals are interpolated from the input's
+normals when it has them, so the surfaces of neighbouring boxes shade
+without seams.
+
+The index of a volume sampled by QuadricSampler is stored in the volume
+cache next to the volume itself (<key>-bricks<size>.npy).
+"""
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.vtkCommonDataModel import vtkImageData, vtkPolyData
+from vtkmodules.vtkFiltersCore import vtkAppendPolyData
+
+from contouring import ISOVALUE_ARRAY, MultiContourFilter, smp_threads, triangle_isovalues
+from quadric_sampler import VOLUME_KEY_ARRAY
+from volume_cache import default_cache
+
+# Cells per brick along each axis
+BRICK_SIZE = 16
+
+
+def axis_ranges(volume, axis, brickSize, reduce, combine):
+    # Brick b spans the points [b * brickSize, (b + 1) * brickSize] along
+    # axis. Whole bricks are reduced as (bricks, brickSize, ...) blocks, which
+    # keeps the reduction elementwise over contiguous planes, and then combined
+    # with the point on their far face
+    volume = np.moveaxis(volume, axis, 0)
+    count = volume.shape[0]
+    whole = (count - 1) // brickSize
+    parts = []
+    if whole:
+        blocks = volume[: whole * brickSize].reshape((whole, brickSize) + volume.shape[1:])
+        parts.append(combine(reduce(blocks, axis=1), volume[brickSize : whole * brickSize + 1 : brickSize]))
+    if whole * brickSize < count - 1 or not whole:
+        parts.append(reduce(volume[whole * brickSize :], axis=0)[None])
+    return np.moveaxis(np.concatenate(parts), 0, axis)
+
+
+def brick_ranges(volume, brickSize=BRICK_SIZE):
+    """
+    (2, bz, by, bx) array of the min and max scalar of every brick of an
+    (nz, ny, nx) volume.
+    """
+    mins, maxs = volume, volume
+    for axis in range(3):
+        mins = axis_ranges(mins, axis, brickSize, np.min, np.minimum)
+        maxs = axis_ranges(maxs, axis, brickSize, np.max, np.maximum)
+    return np.stack([mins, maxs])
+
+
+def x_runs(row):
+    # (start, stop) of every run of True values
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], row, [False]]).astype(np.int8)))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def merge_boxes(mask):
+    """
+    Cover the True cells of a 3D mask with boxes (z0, z1, y0, y1, x0, x1),
+    stop exclusive: runs along x are merged with identical runs in the next
+    rows, and the resulting rectangles with identical ones in the next layers.
+    """
+    boxes = []
+    previousLayer = {}
+    for z in range(mask.shape[0]):
+        rectangles = []
+        openRuns = {}
+        for y in range(mask.shape[1]):
+            runs = x_runs(mask[z, y]) if mask[z, y].any() else []
+            continued = {}
+            for run in runs:
+                continued[run] = openRuns.pop(run, y)
+            for (x0, x1), y0 in openRuns.items():
+                rectangles.append((y0, y, x0, x1))
+            openRuns = continued
+        for (x0, x1), y0 in openRuns.items():
+            rectangles.append((y0, mask.shape[1], x0, x1))
+
+        layer = {}
+        for rectangle in rectangles:
+            layer[rectangle] = previousLayer.pop(rectangle, z)
+        for (y0, y1, x0, x1), z0 in previousLayer.items():
+            boxes.append((z0, z, y0, y1, x0, x1))
+        previousLayer = layer
+    for (y0, y1, x0, x1), z0 in previousLayer.items():
+        boxes.append((z0, mask.shape[0], y0, y1, x0, x1))
+    return boxes
+
+
+def volume_key_of(image):
+    keys = image.GetFieldData().GetAbstractArray(VOLUME_KEY_ARRAY)
+    if keys is None or keys.GetNumberOfValues() == 0:
+        return None
+    return keys.GetValue(0)
+
+
+class BrickIndex(object):
+    """
+    Per-brick scalar ranges of an image.
+    """
+
+    def __init__(self, ranges, dimensions, brickSize=BRICK_SIZE):
+        self.mins, self.maxs = ranges
+        self.dimensions = tuple(dimensions)
+        self.brickSize = brickSize
+
+    @classmethod
+    def for_image(cls, image, brickSize=BRICK_SIZE, cache=None):
+        """
+        Index of image, loaded from or stored in cache when the image carries
+        a volume key.
+        """
+        dimensions = image.GetDimensions()
+        scalars = vtk_to_numpy(image.GetPointData().GetScalars()).reshape(dimensions[::-1])
+        key = volume_key_of(image)
+        if cache is None or key is None:
+            return cls(brick_ranges(scalars, brickSize), dimensions, brickSize)
+        ranges = cache.get("%s-bricks%d" % (key, brickSize), lambda: brick_ranges(scalars, brickSize))
+        return cls(ranges, dimensions, brickSize)
+
+    def active(self, value):
+        """
+        Mask of the bricks whose range contains value.
+        """
+        return (self.mins <= value) & (value <= self.maxs)
+
+    def fraction(self, value):
+        return float(self.active(value).mean())
+
+    def point_extent(self, box):
+        """
+        Point index ranges (z0, z1, y0, y1, x0, x1), stop inclusive, of a box
+        of bricks.
+        """
+        extent = []
+        for axis, (first, last) in enumerate(zip(box[0::2], box[1::2])):
+            count = self.dimensions[2 - axis]
+            extent += [first * self.brickSize, min(last * self.brickSize, count - 1)]
+        return extent
+
+    def boxes(self, value):
+        return [self.point_extent(box) for box in merge_boxes(self.active(value))]
+
+
+class BrickedContourFilter(MultiContourFilter):
+    """
+    MultiContourFilter that contours only the bricks straddling an isovalue.
+
+    The output has the same triangles as a full flying-edges pass; points
+    on the faces between boxes are duplicated.
+    """
+
+    def __init__(self, brickSize=BRICK_SIZE, cache="default"):
+        MultiContourFilter.__init__(self)
+        self.brickSize = brickSize
+        self.cache = default_cache() if cache == "default" else cache
+        self.index = None
+        self._indexed = (None, None)
+
+    def SetBrickSize(self, brickSize):
+        self.brickSize = brickSize
+        self.Modified()
+
+    def brick_index(self, image):
+        scalars = image.GetPointData().GetScalars()
+        array, mtime = self._indexed
+        if self.index is None or self.index.brickSize != self.brickSize or array is not scalars \
+                or mtime != scalars.GetMTime():
+            self.index = BrickIndex.for_image(image, self.brickSize, self.cache)
+            self._indexed = (scalars, scalars.GetMTime())
+        return self.index
+
+    def RequestData(self, request, inInfo, outInfo):
+        image = vtkImageData.GetData(inInfo[0])
+        output = vtkPolyData.GetData(outInfo)
+        index = self.brick_index(image)
+
+        dimensions = image.GetDimensions()
+        extent = image.GetExtent()
+        pointData = image.GetPointData()
+        scalars = vtk_to_numpy(pointData.GetScalars()).reshape(dimensions[::-1])
+        normals = pointData.GetNormals()
+        if normals is not None:
+            normals = vtk_to_numpy(normals).reshape(dimensions[::-1] + (3,))
+
+        flyingEdges = self.flyingEdges
+        flyingEdges.SetComputeNormals(self.computeNormals and normals is None)
+        flyingEdges.SetInterpolateAttributes(self.computeNormals and normals is not None)
+        flyingEdges.SetNumberOfContours(1)
+        box = vtkImageData()
+        box.SetOrigin(image.GetOrigin())
+        box.SetSpacing(image.GetSpacing())
+        flyingEdges.SetInputData(box)
+        append = vtkAppendPolyData()
+        with smp_threads(self.threads):
+            for value in self.values:
+                flyingEdges.SetValue(0, value)
+                for z0, z1, y0, y1, x0, x1 in index.boxes(value):
+                    box.SetExtent(extent[0] + x0, extent[0] + x1, extent[2] + y0, extent[2] + y1,
+                                  extent[4] + z0, extent[4] + z1)
+                    boxScalars = numpy_to_vtk(scalars[z0:z1 + 1, y0:y1 + 1, x0:x1 + 1].reshape(-1), deep=1)
+                    boxScalars.SetName(pointData.GetScalars().GetName())
+                    box.GetPointData().SetScalars(boxScalars)
+                    if flyingEdges.GetInterpolateAttributes():
+                        boxNormals = numpy_to_vtk(normals[z0:z1 + 1, y0:y1 + 1, x0:x1 + 1].reshape(-1, 3), deep=1)
+                        boxNormals.SetName(pointData.GetNormals().GetName())
+                        box.GetPointData().SetNormals(boxNormals)
+                    flyingEdges.Update()
+                    if flyingEdges.GetOutput().GetNumberOfCells():
+                        surface = vtkPolyData()
+                        surface.ShallowCopy(flyingEdges.GetOutput())
+                        append.AddInputData(surface)
+        flyingEdges.SetInputData(None)
+
+        if append.GetNumberOfInputConnections(0) == 0:
+            output.Initialize()
+            return 1
+        append.Update()
+        output.ShallowCopy(append.GetOutput())
+        isovalues = numpy_to_vtk(triangle_isovalues(output), deep=1)
+        isovalues.SetName(ISOVALUE_ARRAY)
+        output.GetCellData().AddArray(isovalues)
+        return 1
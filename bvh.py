@@ -0,0 +1,275 @@
+import os
+
+import numpy as np
+
+# CMU-style BVH joint names -> 03Avatar joint names
+AVATAR_MAPPING = {
+    "Hips": "pelv",
+    "Spine": "spine1",
+    "Spine1": "spine2",
+    "Spine2": "spine3",
+    "Neck": "neck",
+    "Head": "head",
+    "LeftShoulder": "leftCollar",
+    "RightShoulder": "rightCollar",
+    "LeftArm": "leftShoulder",
+    "LeftForeArm": "leftElbow",
+    "LeftHand": "leftWrist",
+    "RightArm": "rightShoulder",
+    "RightForeArm": "rightElbow",
+    "RightHand": "rightWrist",
+    "LeftUpLeg": "leftHip",
+    "LeftLeg": "leftKnee",
+    "LeftFoot": "leftAnkle",
+    "RightUpLeg": "rightHip",
+    "RightLeg": "rightKnee",
+    "RightFoot": "rightAnkle",
+}
+
+# Lines of MOTION data parsed per chunk while building the sidecar
+CHUNK_LINES = 8192
+
+
+def axis_rotations(axis, degrees):
+    """
+    (..., 3, 3) rotation matrices about 'X', 'Y' or 'Z'.
+    """
+    radians = np.radians(degrees)
+    c, s = np.cos(radians), np.sin(radians)
+    m = np.zeros(np.shape(radians) + (3, 3))
+    i, j = {"X": (1, 2), "Y": (2, 0), "Z": (0, 1)}[axis]
+    k = 3 - i - j
+    m[..., k, k] = 1.0
+    m[..., i, i] = c
+    m[..., j, j] = c
+    m[..., i, j] = -s
+    m[..., j, i] = s
+    return m
+
+
+class BVHClip(object):
+    """
+    Motion capture clip read from a BVH file.
+
+    The hierarchy is parsed on construction. The MOTION block is converted
+    once into a float32 sidecar (<file>.motion.npy, one row per frame) and
+    memory-mapped, so frames and frame windows are served lazily by slicing
+    `frames` without decoding the clip into Python lists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names = []
+        self.parents = []
+        self.offsets = []
+        self.channels = []
+        self.channelStart = []
+        self.channelCount = 0
+        self.frameCount = 0
+        self.frameTime = 0.0
+        self._motionOffset = self._parse_hierarchy()
+        self.parents = np.asarray(self.parents, dtype=np.int32)
+        self.offsets = np.asarray(self.offsets, dtype=float)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._frames = None
+
+    def _parse_hierarchy(self):
+        stack = []
+        channelCount = 0
+        with open(self.path, "rb") as f:
+            for raw in iter(f.readline, b""):
+                tokens = raw.decode("ascii", "replace").split()
+                if not tokens:
+                    continue
+                keyword = tokens[0]
+                if keyword in ("ROOT", "JOINT", "End"):
+                    name = " ".join(tokens[1:]) if keyword != "End" else self.names[stack[-1]] + "_End"
+                    self.parents.append(stack[-1] if stack else -1)
+                    self.names.append(name)
+                    self.offsets.append((0.0, 0.0, 0.0))
+                    self.channels.append(())
+                    self.channelStart.append(channelCount)
+                    stack.append(len(self.names) - 1)
+                elif keyword == "OFFSET":
+                    self.offsets[stack[-1]] = tuple(float(value) for value in tokens[1:4])
+                elif keyword == "CHANNELS":
+                    self.channels[stack[-1]] = tuple(tokens[2 : 2 + int(tokens[1])])
+                    channelCount += int(tokens[1])
+                elif keyword == "}":
+                    stack.pop()
+                elif keyword == "Frames:":
+                    self.frameCount = int(tokens[1])
+                elif keyword == "Frame" and tokens[1] == "Time:":
+                    self.frameTime = float(tokens[2])
+                    self.channelCount = channelCount
+                    return f.tell()
+        raise ValueError("%s has no MOTION block" % self.path)
+
+    @property
+    def sidecar_path(self):
+        return os.path.splitext(self.path)[0] + ".motion.npy"
+
+    def _build_sidecar(self):
+        temporaryPath = self.sidecar_path + ".tmp"
+        frames = np.lib.format.open_memmap(
+            temporaryPath, mode="w+", dtype=np.float32, shape=(self.frameCount, self.channelCount)
+        )
+        row = 0
+        with open(self.path, "rb") as f:
+            f.seek(self._motionOffset)
+            while row < self.frameCount:
+                lines = [line for line in (f.readline() for _ in range(CHUNK_LINES)) if line.strip()]
+                if not lines:
+                    break
+                values = np.array(b" ".join(lines).split(), dtype=np.float32)
+                chunk = values.reshape(-1, self.channelCount)[: self.frameCount - row]
+                frames[row : row + len(chunk)] = chunk
+                row += len(chunk)
+        if row != self.frameCount:
+            raise ValueError("%s declares %d frames but contains %d" % (self.path, self.frameCount, row))
+        frames.flush()
+        del frames
+        os.replace(temporaryPath, self.sidecar_path)
+
+    @property
+    def frames(self):
+        """
+        (frameCount, channelCount) float32 memory map of the MOTION block.
+
+        A sidecar is used when it is newer than the clip and has the shape
+        the header declares; otherwise it is rebuilt.
+        """
+        if self._frames is None:
+            shape = (self.frameCount, self.channelCount)
+            if self.frameCount == 0:
+                # Nothing to map; "Frames: 0" is a valid, empty clip
+                self._frames = np.zeros(shape, dtype=np.float32)
+                return self._frames
+            frames = None
+            try:
+                if os.path.getmtime(self.sidecar_path) >= os.path.getmtime(self.path):
+                    frames = np.load(self.sidecar_path, mmap_mode="r")
+            except (OSError, ValueError):
+                frames = None
+            if frames is None or frames.shape != shape or frames.dtype != np.float32:
+                del frames
+                self._build_sidecar()
+                frames = np.load(self.sidecar_path, mmap_mode="r")
+            self._frames = frames
+        return self._frames
+
+    def __len__(self):
+        return self.frameCount
+
+    @property
+    def duration(self):
+        return self.frameCount * self.frameTime
+
+    def rotations(self, frames):
+        """
+        (F, J, 3, 3) local joint rotations for a frame index, slice or array.
+        """
+        values = np.atleast_2d(self.frames[frames])
+        result = np.tile(np.eye(3), (len(values), len(self.names), 1, 1))
+        for joint, channels in enumerate(self.channels):
+            start = self.channelStart[joint]
+            for k, channel in enumerate(channels):
+                if channel.endswith("rotation"):
+                    result[:, joint] = result[:, joint] @ axis_rotations(channel[0].upper(), values[:, start + k])
+        return result
+
+    def root_translations(self, frames):
+        """
+        (F, 3) root position channels for a frame index, slice or array.
+        """
+        values = np.atleast_2d(self.frames[frames])
+        start = self.channelStart[0]
+        translation = np.zeros((len(values), 3))
+        for k, channel in enumerate(self.channels[0]):
+            if channel.endswith("position"):
+                translation[:, "XYZ".index(channel[0].upper())] = values[:, start + k]
+        return translation
+
+    def avatar_rotations(self, frames, skeleton, mapping=AVATAR_MAPPING):
+        """
+        (F, N, 3, 3) rotations for `skeleton` (identity for unmapped joints),
+        ready for skeleton.evaluate_clip().
+        """
+        bvhJoints, avatarJoints = self._mapped(skeleton, mapping)
+        clip = self.rotations(frames)
+        result = np.tile(np.eye(3), (len(clip), len(skeleton), 1, 1))
+        result[:, avatarJoints] = clip[:, bvhJoints]
+        return result
+
+    def length_scale(self, skeleton, mapping=AVATAR_MAPPING):
+        """
+        Avatar units per clip unit, from the bone lengths of the mapped joints
+        (1.0 when no bone can be compared).
+        """
+        bvhJoints, avatarJoints = self._mapped(skeleton, mapping)
+        clipLength = np.linalg.norm(self.offsets[bvhJoints], axis=1)
+        avatarLength = np.linalg.norm(skeleton.rest[avatarJoints, :3, 3], axis=1)
+        compared = (clipLength > 0) & (avatarLength > 0)
+        if not compared.any():
+            return 1.0
+        return float(avatarLength[compared].sum() / clipLength[compared].sum())
+
+    def _mapped(self, skeleton, mapping):
+        pairs = [
+            (self.index[source], skeleton.index[target])
+            for source, target in mapping.items()
+            if source in self.index and target in skeleton.index
+        ]
+        if not pairs:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        bvhJoints, avatarJoints = (np.array(column) for column in zip(*pairs))
+        return bvhJoints, avatarJoints
+
+
+class BVHPlayer(object):
+    """
+    AnimationScheduler animation that plays a BVHClip on a skeleton.
+
+    Only the current frame is read from the memory-mapped clip, so playback
+    can start at any frame of an arbitrarily long capture. With rootMotion,
+    the root position channels move the avatar joint mapped from the clip's
+    root, relative to the clip's first frame and scaled to the avatar by
+    BVHClip.length_scale(). An empty clip finishes at once.
+    """
+
+    def __init__(self, clip, skeleton, mapping=AVATAR_MAPPING, startFrame=0, loop=True, rootMotion=True):
+        self.clip = clip
+        self.skeleton = skeleton
+        self.startFrame = startFrame
+        self.loop = loop
+        self.bvhJoints, self.avatarJoints = clip._mapped(skeleton, mapping)
+        self.startTime = None
+        self.root = None
+        rootName = mapping.get(clip.names[0]) if clip.names else None
+        if rootMotion and len(clip) and rootName in skeleton.index:
+            self.root = skeleton.index[rootName]
+            self.rootScale = clip.length_scale(skeleton, mapping)
+            self.rootOrigin = clip.root_translations(0)[0]
+
+    def start(self, now):
+        self.startTime = now
+
+    def step(self, now):
+        if len(self.clip) == 0:
+            return True
+        frame = self.startFrame
+        if self.clip.frameTime > 0:
+            frame += int((now - self.startTime) / self.clip.frameTime)
+        if frame >= len(self.clip):
+            if not self.loop:
+                return True
+            frame %= len(self.clip)
+        rotations = np.zeros((len(self.avatarJoints), 4, 4))
+        rotations[:, :3, :3] = self.clip.rotations(frame)[0, self.bvhJoints]
+        rotations[:, 3, 3] = 1.0
+        self.skeleton.local[self.avatarJoints] = self.skeleton.rest[self.avatarJoints] @ rotations
+        if self.root is not None:
+            offset = self.rootScale * (self.clip.root_translations(frame)[0] - self.rootOrigin)
+            self.skeleton.local[self.root, :3, 3] = self.skeleton.rest[self.root, :3, 3] + offset
+        self.skeleton.update()
+        return False
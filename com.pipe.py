@@ -1,12 +1,11 @@
 import math
+import sys
 import vtkmodules.vtkInteractionStyle
 import vtkmodules.vtkRenderingOpenGL2
 
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonDataModel import vtkQuadric
-from vtkmodules.vtkFiltersCore import vtkContourFilter
 from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
-from vtkmodules.vtkImagingHybrid import vtkSampleFunction
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
     vtkCamera,
@@ -20,18 +19,22 @@ from vtkmodules.vtkCommonTransforms import vtkTransform  # 수정된 부분
 from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkSphereSource
 from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
 
+from contouring import MultiContourFilter
+from quadric_sampler import QuadricSampler
+import render_stats
+
 
 def create_quadric_actors(colors):
     # Quadric: 생성 및 샘플링
     quadric = vtkQuadric()
     quadric.SetCoefficients(0.5, 1, 0.2, 0, 0.1, 0, 0, 0.2, 0, 0)
 
-    sample = vtkSampleFunction()
+    sample = QuadricSampler()
     sample.SetSampleDimensions(50, 50, 50)
     sample.SetImplicitFunction(quadric)
 
     # 등고선 필터
-    contour = vtkContourFilter()
+    contour = MultiContourFilter()
     contour.SetInputConnection(sample.GetOutputPort())
     contour.GenerateValues(5, 0, 1.2)
 
@@ -149,17 +152,7 @@ def create_hand_actors(colors):
     return all_actors
 
 
-def main():
-    colors = vtkNamedColors()
-
-    # 렌더 윈도우 및 인터랙터 생성
-    renWin = vtkRenderWindow()
-    renWin.SetSize(1200, 600)
-    renWin.SetWindowName("Quadric + Hand Pipeline Example")
-
-    interactor = vtkRenderWindowInteractor()
-    interactor.SetRenderWindow(renWin)
-
+def create_renderers(colors):
     # 왼쪽 렌더러: Quadric
     ren_left = vtkRenderer()
     ren_left.SetViewport(0.0, 0.0, 0.5, 1.0)
@@ -191,12 +184,31 @@ def main():
     cam_right.Elevation(20)
     ren_right.ResetCamera()
 
+    return ren_left, ren_right
+
+
+def main():
+    colors = vtkNamedColors()
+
+    # 렌더 윈도우 및 인터랙터 생성
+    renWin = vtkRenderWindow()
+    renWin.SetSize(1200, 600)
+    renWin.SetWindowName("Quadric + Hand Pipeline Example")
+
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(renWin)
+
+    ren_left, ren_right = create_renderers(colors)
+
     renWin.AddRenderer(ren_left)
     renWin.AddRenderer(ren_right)
 
     style = vtkInteractorStyleTrackballCamera()
     interactor.SetInteractorStyle(style)
 
+    # 렌더 시간 계측 (RENDER_STATS=1 또는 --render-stats)
+    render_stats.attach(renWin, sys.argv)
+
     renWin.Render()
     interactor.Initialize()
     interactor.Start()
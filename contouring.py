@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+"""
+Multi-isovalue contouring of image data with vtkFlyingEdges3D.
+
+MultiContourFilter is a drop-in for vtkContourFilter on volumes (SetValue,
+GenerateValues, GetOutputPort, ...). All isovalues are extracted in one
+SMP-parallel flying-edges pass, and the isovalue of every triangle is
+added as the cell array "Isovalue" next to the usual point scalars.
+
+IsosurfaceManager has the same interface but keeps every extracted surface
+in an LRU cache keyed by (volume hash, isovalue). Changing the isovalues
+only contours the ones that are not cached and appends the rest, so
+stepping an isovalue slider back and forth is immediate after the first
+pass.
+
+Run as a script to compare MultiContourFilter with vtkContourFilter:
+
+    python contouring.py --size 256 --contours 5 --threads 1 2 4
+"""
+
+import argparse
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkAlgorithm import VTKPythonAlgorithmBase
+from vtkmodules.vtkCommonCore import vtkSMPTools
+from vtkmodules.vtkCommonDataModel import vtkImageData, vtkPolyData
+from vtkmodules.vtkFiltersCore import vtkAppendPolyData, vtkContourFilter, vtkFlyingEdges3D
+
+ISOVALUE_ARRAY = "Isovalue"
+DEFAULT_ISOSURFACE_BYTES = 256 << 20
+
+_defaultIsosurfaces = None
+
+
+def set_thread_count(threads):
+    """
+    Use `threads` SMP threads in VTK filters (0: the backend's default) for
+    the rest of the process; filters use smp_threads() instead.
+
+    The sequential backend is replaced by the std::thread one when more than
+    one thread is requested.
+    """
+    if threads != 1 and vtkSMPTools.GetBackend() == "Sequential":
+        vtkSMPTools.SetBackend("STDThread")
+    vtkSMPTools.Initialize(threads)
+
+
+@contextmanager
+def smp_threads(threads):
+    """
+    Run the block with `threads` SMP threads (None: leave VTK's setting),
+    then restore the previous backend and thread count.
+
+    vtkSMPTools.LocalScope is not wrapped for Python, hence the explicit
+    save and restore.
+    """
+    if threads is None:
+        yield
+        return
+    backend = vtkSMPTools.GetBackend()
+    previous = vtkSMPTools.GetEstimatedNumberOfThreads()
+    set_thread_count(threads)
+    try:
+        yield
+    finally:
+        if vtkSMPTools.GetBackend() != backend:
+            vtkSMPTools.SetBackend(backend)
+        vtkSMPTools.Initialize(previous)
+
+
+def generate_values(numberOfContours, rangeStart, rangeEnd):
+    """
+    Isovalues spaced like vtkContourFilter.GenerateValues().
+    """
+    if numberOfContours == 1:
+        return [float(rangeStart)]
+    increment = (rangeEnd - rangeStart) / (numberOfContours - 1)
+    return [rangeStart + i * increment for i in range(numberOfContours)]
+
+
+def triangle_isovalues(polyData):
+    """
+    Isovalue of every polygon, read from the point scalars of its first point.
+    """
+    scalars = polyData.GetPointData().GetScalars()
+    polys = polyData.GetPolys()
+    if scalars is None or polys.GetNumberOfCells() == 0:
+        return np.zeros(polys.GetNumberOfCells())
+    firstPoints = vtk_to_numpy(polys.GetConnectivityArray())[vtk_to_numpy(polys.GetOffsetsArray())[:-1]]
+    return vtk_to_numpy(scalars)[firstPoints]
+
+
+class ContourValues(object):
+    """
+    vtkContourFilter's isovalue methods for algorithms that keep their
+    isovalues in self.values.
+    """
+
+    def SetValue(self, i, value):
+        while len(self.values) <= i:
+            self.values.append(0.0)
+        self.values[i] = float(value)
+        self.Modified()
+
+    def GetValue(self, i):
+        return self.values[i]
+
+    def GetValues(self):
+        return list(self.values)
+
+    def SetNumberOfContours(self, number):
+        self.values = (self.values + [0.0] * number)[:number]
+        self.Modified()
+
+    def GetNumberOfContours(self):
+        return len(self.values)
+
+    def GenerateValues(self, numberOfContours, *valueRange):
+        if len(valueRange) == 1:
+            valueRange = valueRange[0]
+        self.values = generate_values(numberOfContours, *valueRange)
+        self.Modified()
+
+
+class MultiContourFilter(ContourValues, VTKPythonAlgorithmBase):
+    """
+    vtkContourFilter replacement for vtkImageData based on vtkFlyingEdges3D.
+    """
+
+    def __init__(self):
+        VTKPythonAlgorithmBase.__init__(
+            self, nInputPorts=1, inputType="vtkImageData", nOutputPorts=1, outputType="vtkPolyData"
+        )
+        self.values = []
+        self.computeNormals = True
+        self.threads = None
+        self.flyingEdges = vtkFlyingEdges3D()
+        self.flyingEdges.ComputeScalarsOn()
+
+    def GetOutput(self):
+        return self.GetOutputDataObject(0)
+
+    def SetComputeNormals(self, computeNormals):
+        self.computeNormals = bool(computeNormals)
+        self.Modified()
+
+    def SetNumberOfThreads(self, threads):
+        """
+        SMP threads used while this filter executes (None: leave VTK's setting).
+        """
+        self.threads = threads
+        self.Modified()
+
+    def RequestData(self, request, inInfo, outInfo):
+        image = vtkImageData()
+        image.ShallowCopy(vtkImageData.GetData(inInfo[0]))
+        output = vtkPolyData.GetData(outInfo)
+
+        flyingEdges = self.flyingEdges
+        flyingEdges.SetInputData(image)
+        flyingEdges.SetNumberOfContours(len(self.values))
+        for i, value in enumerate(self.values):
+            flyingEdges.SetValue(i, value)
+        flyingEdges.SetComputeNormals(self.computeNormals)
+        with smp_threads(self.threads):
+            flyingEdges.Update()
+
+        output.ShallowCopy(flyingEdges.GetOutput())
+        flyingEdges.SetInputData(None)
+        isovalues = numpy_to_vtk(triangle_isovalues(output), deep=1)
+        isovalues.SetName(ISOVALUE_ARRAY)
+        output.GetCellData().AddArray(isovalues)
+        return 1
+
+
+def image_hash(image):
+    """
+    Hex digest of an image's geometry and point scalars.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr((image.GetDimensions(), image.GetOrigin(), image.GetSpacing())).encode("utf-8"))
+    scalars = image.GetPointData().GetScalars()
+    if scalars is not None:
+        array = np.ascontiguousarray(vtk_to_numpy(scalars))
+        digest.update(array.dtype.str.encode("utf-8"))
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+class IsosurfaceCache(object):
+    """
+    Extracted surfaces (vtkPolyData) with LRU eviction by total memory size.
+    """
+
+    def __init__(self, maxBytes=DEFAULT_ISOSURFACE_BYTES):
+        self.maxBytes = maxBytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def get(self, key):
+        entry = self.surfaces.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.surfaces.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, polyData):
+        if key in self.surfaces:
+            self.bytes -= self.surfaces.pop(key)[1]
+        size = polyData.GetActualMemorySize() * 1024
+        self.surfaces[key] = (polyData, size)
+        self.bytes += size
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        for key in list(self.surfaces):
+            if self.bytes <= self.maxBytes:
+                break
+            if key == keep:
+                continue
+            self.bytes -= self.surfaces.pop(key)[1]
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+
+def default_isosurface_cache():
+    """
+    Cache shared by every IsosurfaceManager that is not given its own.
+    """
+    global _defaultIsosurfaces
+    if _defaultIsosurfaces is None:
+        _defaultIsosurfaces = IsosurfaceCache()
+    return _defaultIsosurfaces
+
+
+class IsosurfaceManager(MultiContourFilter):
+    """
+    MultiContourFilter that contours only the isovalues missing from its cache.
+
+    Every isovalue is extracted on its own and cached under (volume hash,
+    isovalue, normals); the output appends the cached surfaces in value
+    order. The volume is hashed once per modification of its scalars.
+    """
+
+    def __init__(self, cache=None):
+        MultiContourFilter.__init__(self)
+        self.cache = cache if cache is not None else default_isosurface_cache()
+        self.computed = []
+        self._volume = (None, None, None)
+
+    def SetCache(self, cache):
+        self.cache = cache
+        self.Modified()
+
+    def AddValue(self, value):
+        if float(value) not in self.values:
+            self.values.append(float(value))
+            self.Modified()
+
+    def RemoveValue(self, value):
+        if float(value) in self.values:
+            self.values.remove(float(value))
+            self.Modified()
+
+    def volume_hash(self, image):
+        scalars = image.GetPointData().GetScalars()
+        mtime = scalars.GetMTime() if scalars is not None else image.GetMTime()
+        array, arrayTime, digest = self._volume
+        if array is not scalars or arrayTime != mtime:
+            digest = image_hash(image)
+            # Holding the array keeps its identity from being reused
+            self._volume = (scalars, mtime, digest)
+        return digest
+
+    def contour(self, image, value):
+        flyingEdges = self.flyingEdges
+        flyingEdges.SetInputData(image)
+        flyingEdges.SetNumberOfContours(1)
+        flyingEdges.SetValue(0, value)
+        flyingEdges.SetComputeNormals(self.computeNormals)
+        flyingEdges.Update()
+        surface = vtkPolyData()
+        surface.ShallowCopy(flyingEdges.GetOutput())
+        flyingEdges.SetInputData(None)
+        isovalues = numpy_to_vtk(np.full(surface.GetNumberOfCells(), value), deep=1)
+        isovalues.SetName(ISOVALUE_ARRAY)
+        surface.GetCellData().AddArray(isovalues)
+        return surface
+
+    def RequestData(self, request, inInfo, outInfo):
+        image = vtkImageData()
+        image.ShallowCopy(vtkImageData.GetData(inInfo[0]))
+        output = vtkPolyData.GetData(outInfo)
+        volume = self.volume_hash(image)
+
+        surfaces = []
+        self.computed = []
+        with smp_threads(self.threads):
+            for value in self.values:
+                key = (volume, value, self.computeNormals)
+                surface = self.cache.get(key)
+                if surface is None:
+                    surface = self.contour(image, value)
+                    self.cache.put(key, surface)
+                    self.computed.append(value)
+                surfaces.append(surface)
+
+        if not surfaces:
+            output.Initialize()
+            return 1
+        append = vtkAppendPolyData()
+        for surface in surfaces:
+            append.AddInputData(surface)
+        append.Update()
+        output.ShallowCopy(append.GetOutput())
+        return 1
+
+
+def benchmark(size, contours, threads, repeat=3):
+    from quadric_sampler import QuadricSampler
+
+    sample = QuadricSampler()
+    sample.SetCache(None)
+    sample.SetCoefficients(0.5, 1, 0.2, 0, 0.1, 0, 0, 0.2, 0, 0)
+    sample.SetSampleDimensions(size, size, size)
+    sample.ComputeNormalsOff()
+    sample.Update()
+    image = sample.GetOutput()
+
+    def measure(algorithm):
+        algorithm.SetInputDataObject(image)
+        algorithm.GenerateValues(contours, 0.0, 1.2)
+        best = float("inf")
+        for _ in range(repeat):
+            algorithm.Modified()
+            start = time.perf_counter()
+            algorithm.Update()
+            best = min(best, time.perf_counter() - start)
+        return best, algorithm.GetOutputDataObject(0).GetNumberOfCells()
+
+    print("%d^3 volume, %d isovalues, best of %d" % (size, contours, repeat))
+    seconds, cells = measure(vtkContourFilter())
+    print("  %-28s %8.3f s  %9d triangles" % ("vtkContourFilter", seconds, cells))
+    for count in threads:
+        contour = MultiContourFilter()
+        contour.SetNumberOfThreads(count)
+        seconds, cells = measure(contour)
+        print("  %-28s %8.3f s  %9d triangles" % ("flying edges, %d thread(s)" % count, seconds, cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MultiContourFilter against vtkContourFilter.")
+    parser.add_argument("--size", type=int, default=256, help="samples per axis")
+    parser.add_argument("--contours", type=int, default=5)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    benchmark(args.size, args.contours, args.threads, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
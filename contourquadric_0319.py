@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import sys
+
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkInteractionStyle
 
@@ -7,9 +9,8 @@ import vtkmodules.vtkInteractionStyle
 import vtkmodules.vtkRenderingOpenGL2
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonDataModel import vtkQuadric
-from vtkmodules.vtkFiltersCore import vtkContourFilter
 from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
-from vtkmodules.vtkImagingHybrid import vtkSampleFunction
+from vtkmodules.vtkInteractionWidgets import vtkSliderRepresentation2D, vtkSliderWidget
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
     vtkPolyDataMapper,
@@ -18,6 +19,10 @@ from vtkmodules.vtkRenderingCore import (
     vtkRenderer,
 )
 
+from contouring import IsosurfaceManager
+from parallel_contour import ParallelIsosurfaceManager, requested_processes
+from quadric_sampler import QuadricSampler
+
 
 def main():
     colors = vtkNamedColors()
@@ -36,11 +41,17 @@ def main():
     # Sample quadric function
     quadric = vtkQuadric()
     quadric.SetCoefficients(0.5, 1, 0.2, 0, 0.1, 0, 0, 0.2, 0, 0)
-    sample = vtkSampleFunction()
+    sample = QuadricSampler()
     sample.SetSampleDimensions(50, 50, 50)
     sample.SetImplicitFunction(quadric)
 
-    contour = vtkContourFilter()
+    # Isovalues 0, 0.3, 0.6, ...; each surface is extracted once and cached.
+    # --processes [N] contours them in z-slabs on N worker processes
+    processes = requested_processes(sys.argv)
+    if processes is None:
+        contour = IsosurfaceManager()
+    else:
+        contour = ParallelIsosurfaceManager(processes=processes or None)
     contour.SetInputConnection(sample.GetOutputPort())
     contour.GenerateValues(5, 0, 1.2)
 
@@ -78,9 +89,43 @@ def main():
     renWin.SetWindowName("ContourQuadric")
     renWin.Render()
 
+    slider = create_isovalue_slider(iren, contour, colors)
+
     # interact with data
     iren.Start()
 
 
+def create_isovalue_slider(iren, contour, colors, spacing=0.3):
+    # Number of isovalues; only surfaces not extracted before are contoured
+    representation = vtkSliderRepresentation2D()
+    representation.SetMinimumValue(1)
+    representation.SetMaximumValue(10)
+    representation.SetValue(contour.GetNumberOfContours())
+    representation.SetTitleText("Isovalues")
+    representation.SetLabelFormat("%.0f")
+    representation.GetPoint1Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    representation.GetPoint1Coordinate().SetValue(0.1, 0.1)
+    representation.GetPoint2Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    representation.GetPoint2Coordinate().SetValue(0.4, 0.1)
+    representation.GetSliderProperty().SetColor(colors.GetColor3d("Brown"))
+
+    def callback(widget, event):
+        count = int(round(widget.GetRepresentation().GetValue()))
+        if count != contour.GetNumberOfContours():
+            # i * spacing keeps every isovalue, and so its cache key, stable
+            contour.SetNumberOfContours(count)
+            for i in range(count):
+                contour.SetValue(i, i * spacing)
+            iren.GetRenderWindow().Render()
+
+    slider = vtkSliderWidget()
+    slider.SetInteractor(iren)
+    slider.SetRepresentation(representation)
+    slider.SetAnimationModeToJump()
+    slider.AddObserver("InteractionEvent", callback)
+    slider.EnabledOn()
+    return slider
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,35 @@
+from vtkmodules.vtkRenderingCore import vtkPolyDataMapper
+
+# 공유 지오메트리 캐시: (소스 타입, 파라미터) -> 매퍼
+# 같은 모양의 파트는 소스/매퍼를 하나만 만들고 액터마다 변환과 속성만 따로 가집니다.
+geometry_cache = {}
+
+
+def geometry_key(sourceClass, **params):
+    return (sourceClass.__name__,) + tuple(sorted(params.items()))
+
+
+def get_mapper(sourceClass, **params):
+    """
+    Return the shared mapper for a source of the given type and parameters.
+
+    Parameters are applied as Set<Name>(value), e.g. get_mapper(vtkSphereSource, Radius=0.25).
+    """
+    key = geometry_key(sourceClass, **params)
+    mapper = geometry_cache.get(key)
+    if mapper is None:
+        source = sourceClass()
+        for name, value in params.items():
+            getattr(source, "Set" + name)(value)
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputConnection(source.GetOutputPort())
+        geometry_cache[key] = mapper
+    return mapper
+
+
+def get_source(sourceClass, **params):
+    return get_mapper(sourceClass, **params).GetInputAlgorithm()
+
+
+def clear_geometry_cache():
+    geometry_cache.clear()
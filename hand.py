@@ -1,54 +1,102 @@
+import functools
 import math
-import vtk
+import sys
+import vtk_lazy as vtk
 import vtkmodules.vtkInteractionStyle
 import vtkmodules.vtkRenderingOpenGL2
 
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonDataModel import vtkQuadric
-from vtkmodules.vtkFiltersCore import vtkContourFilter, vtkAppendFilter
-from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
-from vtkmodules.vtkImagingCore import vtkExtractVOI
-from vtkmodules.vtkImagingHybrid import vtkSampleFunction
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
     vtkCamera,
     vtkPolyDataMapper,
-    vtkDataSetMapper,
     vtkProperty,
     vtkRenderer,
     vtkRenderWindow,
     vtkRenderWindowInteractor,
-    vtkPropPicker,
 )
 from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkSphereSource
 from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
 
+from animation import AnimationScheduler, Tween
+from picking import PickIndex
+from contouring import IsosurfaceManager, generate_values
+from progressive import ProgressiveIsosurface
+from quadric_pipeline import PipelineCache, create_contours, create_isosurface, create_outline, create_planes
+from quadric_sampler import QuadricSampler
+import render_stats
+
 # 전역 변수 설정 (회전 상태와 변환 객체 저장)
 colors = vtkNamedColors()
 finger_transforms = {}  # 각 손가락 마디의 변환 객체 저장
 finger_actors = {}  # 각 손가락 마디의 액터 저장
+finger_base_matrices = {}  # 각 손가락 마디의 초기 배치 행렬
 old_rotations = {}  # 회전 상태 추적
+finger_animations = {}  # 진행 중인 손가락 애니메이션
 render_window = None  # 렌더윈도우 전역 참조
+scheduler = None  # 애니메이션 스케줄러 전역 참조
+refinement = None  # 점진적으로 세분화되는 등치면 (ProgressiveIsosurface)
+pick_index = PickIndex()  # 액터 -> 마디 ID 역참조와 광선 선택용 BVH
+
+
+def rotate_phalanx(transform, actor_id, direction, fraction):
+    transform.Identity()
+    # 엄지는 Z축 회전, 나머지 손가락은 X축 회전
+    if "thumb" in actor_id:
+        transform.RotateZ(-44 * fraction * direction)
+    else:
+        transform.RotateX(-44 * fraction * direction)
+    # 마디의 원래 위치를 유지한 채 마디 기준으로 회전합니다 (PostMultiply)
+    if actor_id in finger_base_matrices:
+        transform.Concatenate(finger_base_matrices[actor_id])
 
 
 # 마우스 상호작용 핸들러 클래스 정의
 class MouseInteractorHighLightActor(vtkInteractorStyleTrackballCamera):
     def __init__(self, parent=None):
         self.AddObserver("LeftButtonPressEvent", self.leftButtonPressEvent)
+        self.AddObserver("MouseMoveEvent", self.mouseMoveEvent)
         self.LastPickedActor = None
         self.LastPickedProperty = vtkProperty()
+        self.HoveredActor = None
+        self.HoveredAmbient = 0.0
+
+    def pick(self):
+        # 렌더링 없이 카메라 광선을 마디 OBB BVH에 투사해 선택합니다
+        x, y = self.GetInteractor().GetEventPosition()
+        renderer = self.GetDefaultRenderer()
+        if not renderer.IsInViewport(x, y):
+            return None, None
+        return pick_index.pick(renderer, x, y)
+
+    def setHover(self, actor):
+        # 마우스 아래 마디를 밝게 표시하고 이전 마디는 원래대로 되돌립니다
+        if actor is self.HoveredActor:
+            return False
+        if self.HoveredActor:
+            self.HoveredActor.GetProperty().SetAmbient(self.HoveredAmbient)
+        self.HoveredActor = actor
+        if actor:
+            self.HoveredAmbient = actor.GetProperty().GetAmbient()
+            actor.GetProperty().SetAmbient(0.5)
+        return True
+
+    def mouseMoveEvent(self, obj, event):
+        # 카메라 조작 중에는 호버 선택을 하지 않습니다
+        if self.GetState() == 0 and self.setHover(self.pick()[1]):
+            self.GetInteractor().Render()
+        self.OnMouseMove()
 
     def leftButtonPressEvent(self, obj, event):
-        clickPos = self.GetInteractor().GetEventPosition()
-
-        picker = vtkPropPicker()
-        picker.Pick(clickPos[0], clickPos[1], 0, self.GetDefaultRenderer())
-
-        # 선택된 액터 확인
-        self.NewPickedActor = picker.GetActor()
+        actor_id, self.NewPickedActor = self.pick()
 
         # 무언가 선택된 경우
         if self.NewPickedActor:
+            # 호버 표시를 지운 상태의 속성을 저장하기 위해 잠시 해제
+            hovered = self.HoveredActor
+            self.setHover(None)
+
             # 이전에 선택된 액터가 있으면 속성 초기화
             if self.LastPickedActor:
                 self.LastPickedActor.GetProperty().DeepCopy(self.LastPickedProperty)
@@ -61,13 +109,7 @@ class MouseInteractorHighLightActor(vtkInteractorStyleTrackballCamera):
             self.NewPickedActor.GetProperty().SetDiffuse(1.0)
             self.NewPickedActor.GetProperty().SetSpecular(0.0)
             self.NewPickedActor.GetProperty().EdgeVisibilityOn()
-
-            # 액터 ID 찾기
-            actor_id = None
-            for key, actor in finger_actors.items():
-                if actor == self.NewPickedActor:
-                    actor_id = key
-                    break
+            self.setHover(hovered)
 
             # 해당 액터 ID가 있으면 회전 적용
             if actor_id and actor_id in finger_transforms:
@@ -77,17 +119,13 @@ class MouseInteractorHighLightActor(vtkInteractorStyleTrackballCamera):
                 if actor_id not in old_rotations:
                     old_rotations[actor_id] = 1
 
-                # 회전 애니메이션 적용
-                i = 0
-                while i < 45:
-                    transform.Identity()
-                    # 엄지는 Z축 회전, 나머지 손가락은 X축 회전
-                    if "thumb" in actor_id:
-                        transform.RotateZ(-i * old_rotations[actor_id])
-                    else:
-                        transform.RotateX(-i * old_rotations[actor_id])
-                    render_window.Render()
-                    i += 1
+                # 회전 애니메이션 적용 (타이머 기반이라 이벤트 처리를 막지 않습니다)
+                direction = old_rotations[actor_id]
+                if actor_id in finger_animations:
+                    scheduler.remove(finger_animations[actor_id])
+                finger_animations[actor_id] = scheduler.add(
+                    Tween(0.75, functools.partial(rotate_phalanx, transform, actor_id, direction))
+                )
 
                 # 다음 회전 방향 반전
                 old_rotations[actor_id] *= -1
@@ -100,7 +138,8 @@ class MouseInteractorHighLightActor(vtkInteractorStyleTrackballCamera):
         return
 
 
-def create_quadric_visualization(colors):
+def create_quadric_visualization(colors, progressive=False):
+    global refinement
     # Collection of all actors to return
     actors = []
 
@@ -108,126 +147,62 @@ def create_quadric_visualization(colors):
     quadric = vtkQuadric()
     quadric.SetCoefficients(1, 2, 3, 0, 1, 0, 0, 0, 0, 0)
 
-    sample = vtkSampleFunction()
+    sample = QuadricSampler()
     sample.SetSampleDimensions(25, 25, 25)
     sample.SetImplicitFunction(quadric)
 
+    # Filters and mappers shared by this scene's actors
+    pipelines = PipelineCache()
+
+    # 배치 간격은 (점진 모드의 저해상도) 표면이 아니라 샘플링 범위로 정합니다
+    left = sample.GetModelBounds()[0]
+
     # Create isosurface
     isoActor = vtkActor()
-    create_isosurface(sample, isoActor)
+    if progressive:
+        # 16^3 등치면을 바로 보여주고 나머지 해상도는 백그라운드에서 계산합니다
+        refinement = create_progressive_isosurface(quadric, isoActor)
+    else:
+        create_isosurface(sample, isoActor, contourClass=IsosurfaceManager, pipelines=pipelines)
     actors.append(isoActor)
 
     outlineIsoActor = vtkActor()
-    create_outline(sample, outlineIsoActor)
+    create_outline(sample, outlineIsoActor, pipelines)
     actors.append(outlineIsoActor)
 
     # Create planes
     planesActor = vtkActor()
-    create_planes(sample, planesActor, 3)
-    planesActor.AddPosition(isoActor.GetBounds()[0] * 2.0, 0, 0)
+    create_planes(sample, planesActor, 3, pipelines)
+    planesActor.AddPosition(left * 2.0, 0, 0)
     actors.append(planesActor)
 
     outlinePlanesActor = vtkActor()
-    create_outline(sample, outlinePlanesActor)
-    outlinePlanesActor.AddPosition(isoActor.GetBounds()[0] * 2.0, 0, 0)
+    create_outline(sample, outlinePlanesActor, pipelines)
+    outlinePlanesActor.AddPosition(left * 2.0, 0, 0)
     actors.append(outlinePlanesActor)
 
     # Create contours
     contourActor = vtkActor()
-    create_contours(sample, contourActor, 3, 15)
-    contourActor.AddPosition(isoActor.GetBounds()[0] * 4.0, 0, 0.8)
+    create_contours(sample, contourActor, 3, 15, pipelines)
+    contourActor.AddPosition(left * 4.0, 0, 0.8)
     actors.append(contourActor)
 
     outlineContourActor = vtkActor()
-    create_outline(sample, outlineContourActor)
-    outlineContourActor.AddPosition(isoActor.GetBounds()[0] * 4.0, 0, 0)
+    create_outline(sample, outlineContourActor, pipelines)
+    outlineContourActor.AddPosition(left * 4.0, 0, 0)
     actors.append(outlineContourActor)
 
     return actors
 
 
-def create_isosurface(func, actor, numberOfContours=5):
-    # Generate implicit surface
-    contour = vtkContourFilter()
-    contour.SetInputConnection(func.GetOutputPort())
-    ranges = [1.0, 3.0]
-    contour.GenerateValues(numberOfContours, ranges)
-
-    # Map contour
+def create_progressive_isosurface(quadric, actor, numberOfContours=5):
+    # Same isovalues as create_isosurface, refined from 16^3 up to 256^3
     contourMapper = vtkPolyDataMapper()
-    contourMapper.SetInputConnection(contour.GetOutputPort())
     contourMapper.SetScalarRange(0, 9)
-
     actor.SetMapper(contourMapper)
-    return
-
-
-def create_planes(func, actor, numberOfPlanes):
-    # Extract planes from implicit function
-    append = vtkAppendFilter()
-
-    dims = func.GetSampleDimensions()
-    sliceIncr = (dims[2] - 1) // (numberOfPlanes + 1)
-    sliceNum = -4
-    for i in range(0, numberOfPlanes):
-        extract = vtkExtractVOI()
-        extract.SetInputConnection(func.GetOutputPort())
-        extract.SetVOI(
-            0, dims[0] - 1, 0, dims[1] - 1, sliceNum + sliceIncr, sliceNum + sliceIncr
-        )
-        append.AddInputConnection(extract.GetOutputPort())
-        sliceNum += sliceIncr
-    append.Update()
-
-    # Map planes
-    planesMapper = vtkDataSetMapper()
-    planesMapper.SetInputConnection(append.GetOutputPort())
-    planesMapper.SetScalarRange(0, 4)
-
-    actor.SetMapper(planesMapper)
-    actor.GetProperty().SetAmbient(1.0)
-    return
-
-
-def create_contours(func, actor, numberOfPlanes, numberOfContours):
-    # Extract planes from implicit function
-    append = vtkAppendFilter()
-
-    dims = func.GetSampleDimensions()
-    sliceIncr = (dims[2] - 1) // (numberOfPlanes + 1)
-
-    sliceNum = -4
-    for i in range(0, numberOfPlanes):
-        extract = vtkExtractVOI()
-        extract.SetInputConnection(func.GetOutputPort())
-        extract.SetVOI(
-            0, dims[0] - 1, 0, dims[1] - 1, sliceNum + sliceIncr, sliceNum + sliceIncr
-        )
-        ranges = [1.0, 6.0]
-        contour = vtkContourFilter()
-        contour.SetInputConnection(extract.GetOutputPort())
-        contour.GenerateValues(numberOfContours, ranges)
-        append.AddInputConnection(contour.GetOutputPort())
-        sliceNum += sliceIncr
-    append.Update()
-
-    # Map planes
-    planesMapper = vtkDataSetMapper()
-    planesMapper.SetInputConnection(append.GetOutputPort())
-    planesMapper.SetScalarRange(0, 7)
-
-    actor.SetMapper(planesMapper)
-    actor.GetProperty().SetAmbient(1.0)
-    return
-
-
-def create_outline(source, actor):
-    outline = vtkOutlineFilter()
-    outline.SetInputConnection(source.GetOutputPort())
-    mapper = vtkPolyDataMapper()
-    mapper.SetInputConnection(outline.GetOutputPort())
-    actor.SetMapper(mapper)
-    return
+    return ProgressiveIsosurface(
+        actor, quadric.GetCoefficients(), generate_values(numberOfContours, 1.0, 3.0)
+    )
 
 
 def create_hand_actors(colors):
@@ -274,6 +249,8 @@ def create_hand_actors(colors):
         # 변환 객체 저장
         if actor_id:
             finger_transforms[actor_id] = transform
+            finger_base_matrices[actor_id] = vtk.vtkMatrix4x4()
+            finger_base_matrices[actor_id].DeepCopy(transform.GetMatrix())
 
         phalanx_actor = vtkActor()
         phalanx_actor.SetMapper(phalanx_mapper)
@@ -285,10 +262,12 @@ def create_hand_actors(colors):
         # 액터 저장
         if actor_id:
             finger_actors[actor_id] = phalanx_actor
+            pick_index.add(phalanx_actor, actor_id)
 
         return phalanx_actor
 
     palm_actor = create_palm()
+    pick_index.add(palm_actor, "palm")
     all_actors.append(palm_actor)
 
     # 엄지
@@ -506,25 +485,14 @@ def create_hand_actors(colors):
     return all_actors
 
 
-def main():
-    global render_window
-    colors = vtkNamedColors()
-
-    # Create render window and interactor
-    render_window = vtkRenderWindow()
-    render_window.SetSize(1200, 600)
-    render_window.SetWindowName("Interactive Hand with Quadric Visualization")
-
-    interactor = vtkRenderWindowInteractor()
-    interactor.SetRenderWindow(render_window)
-
+def create_renderers(colors, progressive=False):
     # Left renderer: Quadric Visualization
     ren_left = vtkRenderer()
     ren_left.SetViewport(0.0, 0.0, 0.5, 1.0)
     ren_left.SetBackground(colors.GetColor3d("SlateGray"))
 
     # Get all actors from quadric visualization
-    quadric_actors = create_quadric_visualization(colors)
+    quadric_actors = create_quadric_visualization(colors, progressive)
     for actor in quadric_actors:
         ren_left.AddActor(actor)
 
@@ -552,6 +520,27 @@ def main():
     cam_right.Elevation(20)
     ren_right.ResetCamera()
 
+    # Enable two-sided lighting for better visualization
+    ren_left.TwoSidedLightingOn()
+
+    return ren_left, ren_right
+
+
+def main():
+    global render_window, scheduler
+    colors = vtkNamedColors()
+
+    # Create render window and interactor
+    render_window = vtkRenderWindow()
+    render_window.SetSize(1200, 600)
+    render_window.SetWindowName("Interactive Hand with Quadric Visualization")
+
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    # --progressive: 거친 등치면을 먼저 보여주고 백그라운드에서 점차 세분화합니다
+    ren_left, ren_right = create_renderers(colors, "--progressive" in sys.argv)
+
     # Add renderers to window
     render_window.AddRenderer(ren_left)
     render_window.AddRenderer(ren_right)
@@ -561,12 +550,18 @@ def main():
     style.SetDefaultRenderer(ren_right)  # 오른쪽 뷰포트에서만 마우스 상호작용 활성화
     interactor.SetInteractorStyle(style)
 
-    # Enable two-sided lighting for better visualization
-    ren_left.TwoSidedLightingOn()
+    # 렌더 시간 계측 (RENDER_STATS=1 또는 --render-stats)
+    render_stats.attach(render_window, sys.argv)
 
     render_window.Render()
     interactor.Initialize()
+    scheduler = AnimationScheduler(interactor, fps=60)
+    if refinement:
+        refinement.attach(scheduler)
     interactor.Start()
+    if refinement:
+        # 창을 닫으면 진행 중인 세분화를 취소합니다
+        refinement.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Cold import cost of the demo scripts.
+
+Every script is loaded (without running its main) in a fresh interpreter
+started with -X importtime. The report gives the wall time of the load and
+the modules with the largest cumulative import cost; with --budget the
+exit status is 1 when any script takes longer than the budget.
+
+    python import_profile.py hand.py pipe_0319.py --budget 1000
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = [
+    "03Avatar.py",
+    "hand.py",
+    "com.pipe.py",
+    "pipe_0319.py",
+    "test.py",
+    "contourquadric_0319.py",
+    "quadricVisualization_0319.py",
+]
+
+# Loads a script by path, since names such as "03Avatar" or "com.pipe" are
+# not importable, and prints the load time in ms as the last stdout line
+LOADER = """
+import importlib.util, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {here!r})
+spec = importlib.util.spec_from_file_location("__profiled__", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(1000.0 * (time.perf_counter() - start))
+"""
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def parse_importtime(text):
+    """
+    (module, self_us, cumulative_us, depth) for every line of -X importtime output.
+    """
+    modules = []
+    for line in text.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            selfTime, cumulative, indent, name = match.groups()
+            modules.append((name, int(selfTime), int(cumulative), (len(indent) - 1) // 2))
+    return modules
+
+
+def profile(script):
+    """
+    Load time (ms) and per-module import costs of script in a fresh interpreter.
+    """
+    path = os.path.join(HERE, script)
+    environment = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER.format(here=HERE, path=path)],
+        cwd=HERE, env=environment, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError("loading %s failed:\n%s" % (script, result.stderr[-2000:]))
+    return {
+        "load_ms": float(result.stdout.split()[-1]),
+        "modules": parse_importtime(result.stderr),
+    }
+
+
+def report(script, profiled, top=10):
+    print("%s: %.0f ms" % (script, profiled["load_ms"]))
+    # Only the direct imports, so nested costs are not counted twice
+    direct = [module for module in profiled["modules"] if module[3] == 0]
+    for name, _, cumulative, _ in sorted(direct, key=lambda module: -module[2])[:top]:
+        print("    %8.1f ms  %s" % (cumulative / 1000.0, name))
+
+
+def check_budget(results, budget):
+    """
+    Scripts whose load time exceeds budget (ms).
+    """
+    return [script for script, profiled in results.items() if profiled["load_ms"] > budget]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("scripts", nargs="*", help="scripts to load (default: %s)" % ", ".join(ENTRY_POINTS))
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 0)) or None,
+                        help="fail when a script loads slower than this many ms (default: $IMPORT_BUDGET_MS)")
+    parser.add_argument("--top", type=int, default=10, help="imports listed per script")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for script in args.scripts or ENTRY_POINTS:
+        results[script] = profile(script)
+        report(script, results[script], args.top)
+    if args.budget:
+        over = check_budget(results, args.budget)
+        for script in over:
+            print("%s exceeds the import budget: %.0f ms > %.0f ms" % (script, results[script]["load_ms"], args.budget))
+        return 1 if over else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import numpy as np
+
+from avatar_instancing import matrices_to_quaternions
+from skeleton import euler_matrices
+
+# Above this |cos(angle)| slerp falls back to nlerp to avoid dividing by sin(angle) ~ 0
+SLERP_THRESHOLD = 0.9995
+
+
+def euler_to_quaternions(angles):
+    """
+    (..., 4) quaternions (w, x, y, z) for (..., 3) Euler angles in degrees,
+    with the same convention as skeleton.euler_matrices().
+    """
+    angles = np.asarray(angles, dtype=float)
+    matrices = euler_matrices(angles)[..., :3, :3]
+    return matrices_to_quaternions(matrices.reshape(-1, 3, 3)).reshape(angles.shape[:-1] + (4,))
+
+
+def quaternions_to_matrices(q):
+    """
+    (..., 3, 3) rotation matrices for (..., 4) unit quaternions (w, x, y, z).
+    """
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    m = np.empty(q.shape[:-1] + (3, 3))
+    m[..., 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    m[..., 0, 1] = 2.0 * (x * y - w * z)
+    m[..., 0, 2] = 2.0 * (x * z + w * y)
+    m[..., 1, 0] = 2.0 * (x * y + w * z)
+    m[..., 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    m[..., 1, 2] = 2.0 * (y * z - w * x)
+    m[..., 2, 0] = 2.0 * (x * z - w * y)
+    m[..., 2, 1] = 2.0 * (y * z + w * x)
+    m[..., 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    return m
+
+
+def nlerp(q0, q1, u):
+    """
+    Normalized linear interpolation of (..., 4) quaternions; u is (...).
+    """
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where(dot[..., None] < 0.0, -q1, q1)
+    q = q0 + u[..., None] * (q1 - q0)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def slerp(q0, q1, u):
+    """
+    Spherical linear interpolation of (..., 4) quaternions along the shortest arc.
+    """
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where(dot[..., None] < 0.0, -q1, q1)
+    dot = np.abs(dot)
+    close = dot > SLERP_THRESHOLD
+
+    angle = np.arccos(np.minimum(dot, 1.0))
+    sine = np.where(close, 1.0, np.sin(angle))
+    w0 = np.where(close, 1.0 - u, np.sin((1.0 - u) * angle) / sine)
+    w1 = np.where(close, u, np.sin(u * angle) / sine)
+    q = w0[..., None] * q0 + w1[..., None] * q1
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+class KeyframeTrack(object):
+    """
+    Keys for a group of joints that share key times.
+
+    `rotations` are (K, J, 4) quaternions or (K, J, 3) Euler angles in degrees
+    relative to the rest pose, `translations` optional (K, J, 3) offsets added
+    to the rest translation. Before the first key and after the last one the
+    track holds the first and last key.
+    """
+
+    def __init__(self, joints, times, rotations, translations=None, interpolation="slerp"):
+        self.joints = list(joints)
+        self.times = np.asarray(times, dtype=float)
+        rotations = np.asarray(rotations, dtype=float)
+        if rotations.shape[-1] == 3:
+            rotations = euler_to_quaternions(rotations)
+        self.rotations = rotations / np.linalg.norm(rotations, axis=-1, keepdims=True)
+        self.translations = None if translations is None else np.asarray(translations, dtype=float)
+        self.interpolate = {"slerp": slerp, "nlerp": nlerp}[interpolation]
+        if self.rotations.shape[:2] != (len(self.times), len(self.joints)):
+            raise ValueError("rotations must have one key per time and joint")
+        if np.any(np.diff(self.times) < 0.0):
+            raise ValueError("key times must be sorted")
+
+    @property
+    def duration(self):
+        return self.times[-1] if len(self.times) else 0.0
+
+    def segments(self, times):
+        """
+        Key index i and blend factor u in [0, 1] between keys i and i + 1 for every time.
+        """
+        times = np.asarray(times, dtype=float)
+        if len(self.times) < 2:
+            return np.zeros(times.shape, dtype=np.intp), np.zeros(times.shape)
+        i = np.clip(np.searchsorted(self.times, times, side="right") - 1, 0, len(self.times) - 2)
+        span = self.times[i + 1] - self.times[i]
+        u = np.clip((times - self.times[i]) / np.where(span > 0.0, span, 1.0), 0.0, 1.0)
+        return i, u
+
+    def sample(self, times):
+        """
+        (T, J, 4) rotations and (T, J, 3) translations (or None) at `times`.
+        """
+        i, u = self.segments(times)
+        if len(self.times) < 2:
+            rotations = self.rotations[i]
+        else:
+            u = np.broadcast_to(u[:, None], u.shape + (len(self.joints),))
+            rotations = self.interpolate(self.rotations[i], self.rotations[i + 1], u)
+        translations = None
+        if self.translations is not None:
+            if len(self.times) < 2:
+                translations = self.translations[i]
+            else:
+                t0, t1 = self.translations[i], self.translations[i + 1]
+                translations = t0 + u[..., None] * (t1 - t0)
+        return rotations, translations
+
+
+class KeyframeAnimation(object):
+    """
+    Set of keyframe tracks evaluated for all joints of a skeleton at once.
+
+    local(times) returns the (T, N, 4, 4) local transforms at any array of
+    times, so playback can scrub, run at any speed or skip frames without
+    accumulating error.
+    """
+
+    def __init__(self, skeleton, tracks=()):
+        self.skeleton = skeleton
+        self.tracks = list(tracks)
+
+    def add(self, track):
+        self.tracks.append(track)
+        return track
+
+    @property
+    def duration(self):
+        return max((track.duration for track in self.tracks), default=0.0)
+
+    def local(self, times):
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        local = np.broadcast_to(self.skeleton.rest, (len(times),) + self.skeleton.rest.shape).copy()
+        for track in self.tracks:
+            joints = [self.skeleton.joint(joint) for joint in track.joints]
+            rotations, translations = track.sample(times)
+            rest = self.skeleton.rest[joints]
+            local[:, joints, :3, :3] = rest[:, :3, :3] @ quaternions_to_matrices(rotations)
+            if translations is not None:
+                local[:, joints, :3, 3] = rest[:, :3, 3] + translations
+        return local
+
+    def world(self, times):
+        return self.skeleton.forward(self.local(times))
+
+    def pose(self, t):
+        """
+        Set the skeleton to time t and update its actors.
+        """
+        self.skeleton.local[:] = self.local(t)[0]
+        return self.skeleton.update()
+
+
+class KeyframePlayer(object):
+    """
+    AnimationScheduler animation playing a KeyframeAnimation.
+
+    The pose is evaluated from wall-clock time scaled by `speed`, so playback
+    is independent of the frame rate. seek() jumps to any time.
+    """
+
+    def __init__(self, animation, speed=1.0, loop=False):
+        self.animation = animation
+        self.speed = speed
+        self.loop = loop
+        self.offset = 0.0
+        self.startTime = None
+
+    def start(self, now):
+        self.startTime = now
+
+    def seek(self, t, now):
+        """
+        Continue playback from animation time t at scheduler time `now`.
+        """
+        self.offset = t
+        self.startTime = now
+        self.animation.pose(t)
+
+    def step(self, now):
+        t = self.offset + (now - self.startTime) * self.speed
+        duration = self.animation.duration
+        if self.loop and duration > 0.0:
+            t %= duration
+        self.animation.pose(t)
+        if self.loop:
+            return False
+        return t >= duration if self.speed >= 0.0 else t <= 0.0
@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+from vtkmodules.vtkFiltersSources import vtkCubeSource, vtkCylinderSource, vtkSphereSource
+
+from geometry_cache import get_mapper
+
+# Coarser tessellation levels per primitive, coarse to fine. The finest
+# level is the mapper the scene itself draws the part with: the default
+# 8 x 8 sphere, and the cylinder resolution of the skeleton record
+SPHERE_RESOLUTIONS = ((4, 3), (6, 4), (6, 6))
+CYLINDER_RESOLUTIONS = (6, 12, 32)
+
+
+def shape_levels(shape, params):
+    """
+    Shared mappers for every tessellation level of a skeleton-table primitive.
+    """
+    if shape == "sphere":
+        levels = [
+            get_mapper(vtkSphereSource, Radius=params[0], ThetaResolution=theta, PhiResolution=phi)
+            for theta, phi in SPHERE_RESOLUTIONS
+        ]
+        return levels + [get_mapper(vtkSphereSource, Radius=params[0])]
+    if shape == "cylinder":
+        resolution = int(params[2])
+        levels = [
+            get_mapper(vtkCylinderSource, Radius=params[0], Height=params[1], Resolution=coarse)
+            for coarse in CYLINDER_RESOLUTIONS
+            if coarse < resolution
+        ]
+        return levels + [get_mapper(vtkCylinderSource, Radius=params[0], Height=params[1], Resolution=resolution)]
+    if shape == "cube":
+        return [get_mapper(vtkCubeSource, XLength=params[0], YLength=params[1], ZLength=params[2])]
+    raise ValueError("unknown shape %r" % shape)
+
+
+def triangle_count(mapper, port=0, connection=0):
+    algorithm = mapper.GetInputAlgorithm(port, connection)
+    if algorithm is None:
+        return 0
+    algorithm.Update()
+    data = mapper.GetInputDataObject(port, connection)
+    if data is None or not data.IsA("vtkPolyData"):
+        return 0
+    # An n-gon fans into n - 2 triangles, a strip of n points holds n - 2
+    total = 0
+    for cells in (data.GetPolys(), data.GetStrips()):
+        total += cells.GetNumberOfConnectivityIds() - 2 * cells.GetNumberOfCells()
+    return total
+
+
+class LODManager(object):
+    """
+    Switches each actor between tessellation levels before every render.
+
+    The level follows the actor's projected size in pixels: level i+1 is used
+    once the size exceeds thresholds[i]. To avoid flicker an actor only moves
+    up when it is `hysteresis` above a threshold and only moves down when it is
+    `hysteresis` below it. If the scene still exceeds `triangleBudget`, the
+    smallest actors on screen are coarsened first.
+    """
+
+    def __init__(self, renderer, thresholds=(16.0, 48.0, 160.0), triangleBudget=200000, hysteresis=0.15):
+        self.renderer = renderer
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.triangleBudget = triangleBudget
+        self.hysteresis = hysteresis
+        self.actors = []
+        self.levels = []
+        self.triangles = []
+        self.current = []
+        self.renderer.AddObserver("StartEvent", self.onStart)
+
+    def add(self, actor, levels):
+        self.actors.append(actor)
+        self.levels.append(levels)
+        self.triangles.append([triangle_count(mapper) for mapper in levels])
+        self.current.append(len(levels) - 1)
+        actor.SetMapper(levels[-1])
+
+    def projected_sizes(self):
+        """
+        Projected bounding-sphere diameter of every actor in pixels.
+        """
+        camera = self.renderer.GetActiveCamera()
+        height = max(self.renderer.GetSize()[1], 1)
+        bounds = np.array([actor.GetBounds() for actor in self.actors]).reshape(-1, 3, 2)
+        centers = bounds.mean(axis=2)
+        radii = 0.5 * np.linalg.norm(bounds[:, :, 1] - bounds[:, :, 0], axis=1)
+        if camera.GetParallelProjection():
+            return 2.0 * radii * height / (2.0 * camera.GetParallelScale())
+        distances = np.linalg.norm(centers - np.array(camera.GetPosition()), axis=1)
+        distances = np.maximum(distances - radii, 1e-6)
+        halfAngle = math.tan(math.radians(camera.GetViewAngle()) / 2.0)
+        return 2.0 * radii * height / (2.0 * distances * halfAngle)
+
+    def select_levels(self, sizes):
+        levels = []
+        for size, current, available in zip(sizes, self.current, self.levels):
+            top = len(available) - 1
+            level = min(current, top)
+            while level < top and size > self.thresholds[min(level, len(self.thresholds) - 1)] * (1.0 + self.hysteresis):
+                level += 1
+            while level > 0 and size < self.thresholds[min(level - 1, len(self.thresholds) - 1)] * (1.0 - self.hysteresis):
+                level -= 1
+            levels.append(level)
+
+        # Coarsen the smallest actors on screen until the budget holds
+        total = sum(triangles[level] for triangles, level in zip(self.triangles, levels))
+        if total > self.triangleBudget:
+            for i in np.argsort(sizes):
+                while levels[i] > 0 and total > self.triangleBudget:
+                    total -= self.triangles[i][levels[i]] - self.triangles[i][levels[i] - 1]
+                    levels[i] -= 1
+                if total <= self.triangleBudget:
+                    break
+        return levels
+
+    def update(self):
+        if not self.actors:
+            return
+        for i, level in enumerate(self.select_levels(self.projected_sizes())):
+            if level != self.current[i]:
+                self.current[i] = level
+                self.actors[i].SetMapper(self.levels[i][level])
+
+    def triangle_total(self):
+        return sum(triangles[level] for triangles, level in zip(self.triangles, self.current))
+
+    def onStart(self, obj, event):
+        self.update()
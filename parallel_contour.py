@@ -0,0 +1,541 @@
+#!/usr/bin/env python
+"""
+Piece-parallel isosurfaces over a process pool.
+
+SMP threads only help inside one VTK filter; ParallelContourFilter splits
+the volume itself. The point arrays of the input are copied once into
+multiprocessing.shared_memory, where the worker processes attach to them
+without copying. Every worker contours a z-slab of the volume with
+vtkFlyingEdges3D and returns its triangles as NumPy arrays. Neighbouring
+slabs share their boundary plane of points, so every cell is contoured
+once; the crossings of the edges inside a shared plane, which both slabs
+create, are welded pairwise when the pieces are merged. The output has the
+same points and triangles as a single flying-edges pass (python
+parallel_contour.py --check compares them).
+
+When the input has normals (QuadricSampler's analytic ones), they are
+shared too and interpolated onto the surface, so the welded points shade
+without seams; otherwise the workers compute flying-edges gradients.
+
+The shared volume is kept until the input scalars change, so sweeping the
+isovalues only contours. ParallelIsosurfaceManager is the same for
+IsosurfaceManager: the isovalues missing from its cache are contoured in
+parallel. Scripts opt in with --processes [N] or CONTOUR_PROCESSES=N
+(N = 0 or no N: one process per CPU).
+
+Run as a script to compare the process counts on one volume:
+
+    python parallel_contour.py --size 512 --contours 5 --processes 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, vtk_to_numpy
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkImageData, vtkPolyData
+from vtkmodules.vtkFiltersCore import vtkFlyingEdges3D
+
+from contouring import ISOVALUE_ARRAY, IsosurfaceManager, MultiContourFilter, set_thread_count, triangle_isovalues
+
+ENVIRONMENT_VARIABLE = "CONTOUR_PROCESSES"
+COMMAND_LINE_FLAG = "--processes"
+
+# Thinner slabs are not worth a task
+MIN_SLAB_CELLS = 8
+
+_pool = None
+_poolSize = None
+
+# Worker side: attached shared blocks by name, and the contour filter
+_attached = {}
+_flyingEdges = None
+
+
+def requested_processes(argv=None):
+    """
+    Worker processes asked for by --processes [N] or CONTOUR_PROCESSES=N
+    (0: one per CPU), or None when contouring stays in process.
+    """
+    if argv is not None and COMMAND_LINE_FLAG in argv:
+        following = argv[argv.index(COMMAND_LINE_FLAG) + 1 : argv.index(COMMAND_LINE_FLAG) + 2]
+        return int(following[0]) if following and following[0].isdigit() else 0
+    value = os.environ.get(ENVIRONMENT_VARIABLE)
+    return int(value) if value else None
+
+
+def process_pool(processes):
+    """
+    Shared pool of `processes` workers, recreated when the size changes.
+    """
+    global _pool, _poolSize
+    if _pool is None or _poolSize != processes:
+        if _pool is not None:
+            _pool.shutdown()
+        # Spawned, not forked: the sampler's thread pool and VTK's SMP
+        # threads may be running. One SMP thread per worker; the processes
+        # are the parallelism
+        _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=set_thread_count, initargs=(1,))
+        _poolSize = processes
+    return _pool
+
+
+def slab_extents(count, pieces):
+    """
+    (first, last) point planes of `pieces` slabs over `count` planes; each
+    slab starts on the last plane of the previous one.
+    """
+    cells = count - 1
+    bounds = [int(round(cells * i / float(pieces))) for i in range(pieces + 1)]
+    return [(first, last) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+
+
+class SharedVolume(object):
+    """
+    Point arrays copied into shared memory blocks that workers attach to by name.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach(specs):
+    """
+    Worker side: NumPy views of the shared arrays described by specs.
+
+    Blocks of earlier volumes are closed, so a worker maps only the volume
+    of its current task.
+    """
+    live = set(spec[0] for spec in specs.values())
+    for name in list(_attached):
+        if name not in live:
+            _attached.pop(name).close()
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        block = _attached.get(name)
+        if block is None:
+            block = _attached[name] = shared_memory.SharedMemory(name=name)
+        arrays[key] = np.ndarray(shape, dtype, buffer=block.buf)
+    return arrays
+
+
+def plane_crossings(plane, value):
+    """
+    Crossings of the x- and y-edges of each row of a sample plane, counted
+    like flying edges (samples >= value are inside); the y-edges of a row
+    lead to the next row.
+    """
+    inside = plane >= np.float64(value)
+    crossings = np.count_nonzero(inside[:, 1:] != inside[:, :-1], axis=1)
+    crossings[:-1] += np.count_nonzero(inside[1:] != inside[:-1], axis=1)
+    return crossings
+
+
+def row_ranges(starts, counts):
+    # Concatenated ranges [start, start + count)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+
+def contour_slab(specs, extent, first, origin, spacing, values, computeNormals, shared):
+    """
+    Worker task: contour the sub-extent of the shared volume whose first
+    plane is plane `first` of the shared arrays.
+
+    shared tells whether the (lower, upper) plane is shared with a
+    neighbouring slab. Returns (points, triangles, scalars, normals, lower,
+    upper) as NumPy arrays; lower and upper index the crossings of the x-
+    and y-edges inside the shared planes, in the same order in both slabs.
+    """
+    global _flyingEdges
+    volume = attach(specs)
+    scalars = volume["scalars"]
+    z0, z1 = first, first + extent[5] - extent[4]
+    image = vtkImageData()
+    image.SetExtent(extent)
+    image.SetOrigin(origin)
+    image.SetSpacing(spacing)
+    # z-slabs of a C-ordered volume are contiguous, so VTK wraps them
+    array = numpy_to_vtk(scalars[z0 : z1 + 1].reshape(-1), deep=0)
+    array.SetName("scalars")
+    image.GetPointData().SetScalars(array)
+    interpolate = computeNormals and "normals" in specs
+    if interpolate:
+        normals = numpy_to_vtk(volume["normals"][z0 : z1 + 1].reshape(-1, 3), deep=0)
+        normals.SetName("normals")
+        image.GetPointData().SetNormals(normals)
+
+    if _flyingEdges is None:
+        _flyingEdges = vtkFlyingEdges3D()
+        _flyingEdges.ComputeScalarsOn()
+    flyingEdges = _flyingEdges
+    flyingEdges.SetInputData(image)
+    flyingEdges.SetNumberOfContours(1)
+    flyingEdges.SetComputeNormals(computeNormals and not interpolate)
+    flyingEdges.SetInterpolateAttributes(interpolate)
+
+    # One isovalue at a time, so each one's points are a block numbered the
+    # flying-edges way: row by row, the x-, y- and then z-edge crossings.
+    # The shared planes' crossings are picked by that order rather than by
+    # position, since a z-edge crossing can coincide with one in the plane
+    parts = []
+    count = 0
+    for value in values:
+        flyingEdges.SetValue(0, value)
+        flyingEdges.Update()
+        surface = flyingEdges.GetOutput()
+        points = surface.GetNumberOfPoints()
+        if points == 0:
+            continue
+        surfaceNormals = surface.GetPointData().GetNormals()
+        lower = upper = np.zeros(0, dtype=np.int64)
+        if shared[0]:
+            inPlane = plane_crossings(scalars[z0], value)
+            inside = [plane >= np.float64(value) for plane in scalars[z0 : z0 + 2]]
+            rows = inPlane + np.count_nonzero(inside[0] != inside[1], axis=1)
+            lower = count + row_ranges(np.cumsum(rows) - rows, inPlane)
+        if shared[1]:
+            # The last plane has no z-edges, so its rows end the block
+            upper = count + np.arange(points - plane_crossings(scalars[z1], value).sum(), points)
+        parts.append((vtk_to_numpy(surface.GetPoints().GetData()).copy(),
+                      vtk_to_numpy(surface.GetPolys().GetConnectivityArray()).reshape(-1, 3) + count,
+                      vtk_to_numpy(surface.GetPointData().GetScalars()).copy(),
+                      vtk_to_numpy(surfaceNormals).copy() if surfaceNormals is not None else None,
+                      lower, upper))
+        count += points
+    flyingEdges.SetInputData(None)
+
+    if not parts:
+        return None
+    return tuple(np.concatenate(arrays) if arrays[0] is not None else None for arrays in zip(*parts))
+
+
+def weld_pairs(upper, lower):
+    """
+    (upper, lower) index pairs of the points that two neighbouring slabs
+    both created on their shared plane.
+
+    Both slabs list the crossings of the plane's own edges in the same
+    order, so they pair up by position.
+    """
+    if len(upper) != len(lower):
+        raise RuntimeError("slabs disagree on a shared plane: %d and %d crossings" % (len(upper), len(lower)))
+    return upper, lower
+
+
+def merge_pieces(pieces):
+    """
+    Concatenate slab results and weld the points created twice on shared planes.
+
+    Only the crossings of edges inside the common plane of neighbouring
+    slabs are welded, one to one; crossings of the z-edges that touch the
+    plane, and points that coincide within a slab, stay as flying edges made
+    them. Returns (points, triangles, scalars, normals).
+    """
+    counts = [len(piece[0]) if piece is not None else 0 for piece in pieces]
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    present = [(piece, offset) for piece, offset in zip(pieces, offsets) if piece is not None]
+    points = np.concatenate([piece[0] for piece, _ in present])
+    triangles = np.concatenate([piece[1] + offset for piece, offset in present])
+    scalars = np.concatenate([piece[2] for piece, _ in present])
+    normals = None
+    if present[0][0][3] is not None:
+        normals = np.concatenate([piece[3] for piece, _ in present])
+
+    # Both slabs interpolate a shared-plane point from the same two samples,
+    # so its coordinates (and isovalue) match exactly
+    remap = np.arange(len(points))
+    for i in range(len(pieces) - 1):
+        below, above = pieces[i], pieces[i + 1]
+        if below is None or above is None:
+            continue
+        upper, lower = weld_pairs(below[5] + offsets[i], above[4] + offsets[i + 1])
+        remap[lower] = upper
+    keep = remap == np.arange(len(points))
+    newIndex = np.cumsum(keep) - 1
+    triangles = newIndex[remap[triangles]]
+    return points[keep], triangles, scalars[keep], normals[keep] if normals is not None else None
+
+
+def pieces_to_polydata(points, triangles, scalars, normals, scalarName="scalars"):
+    polyData = vtkPolyData()
+    outPoints = vtkPoints()
+    outPoints.SetData(numpy_to_vtk(points, deep=1))
+    polyData.SetPoints(outPoints)
+    polys = vtkCellArray()
+    polys.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 3 * len(triangles) + 1, 3), deep=1),
+                  numpy_to_vtkIdTypeArray(triangles.reshape(-1), deep=1))
+    polyData.SetPolys(polys)
+    pointScalars = numpy_to_vtk(scalars, deep=1)
+    pointScalars.SetName(scalarName)
+    polyData.GetPointData().SetScalars(pointScalars)
+    if normals is not None:
+        pointNormals = numpy_to_vtk(normals, deep=1)
+        pointNormals.SetName("Normals")
+        polyData.GetPointData().SetNormals(pointNormals)
+    isovalues = numpy_to_vtk(triangle_isovalues(polyData), deep=1)
+    isovalues.SetName(ISOVALUE_ARRAY)
+    polyData.GetCellData().AddArray(isovalues)
+    return polyData
+
+
+class PieceContourer(object):
+    """
+    Contours images across a process pool, keeping the last image's point
+    arrays in shared memory.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self.volume = None
+        self._shared = (None, None)
+        self._finalizer = None
+
+    def process_count(self):
+        return self.processes or os.cpu_count()
+
+    def shared_volume(self, image, normals):
+        pointData = image.GetPointData()
+        scalars = pointData.GetScalars()
+        key = (scalars.GetMTime(), normals and pointData.GetNormals() is not None)
+        array, previous = self._shared
+        if self.volume is None or array is not scalars or previous != key:
+            self.release()
+            dimensions = image.GetDimensions()[::-1]
+            arrays = {"scalars": vtk_to_numpy(scalars).reshape(dimensions)}
+            if key[1]:
+                arrays["normals"] = vtk_to_numpy(pointData.GetNormals()).reshape(dimensions + (3,))
+            self.volume = SharedVolume(arrays)
+            self._finalizer = weakref.finalize(self, self.volume.close)
+            # Holding the array keeps its identity from being reused
+            self._shared = (scalars, key)
+        return self.volume
+
+    def release(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.volume = None
+        self._finalizer = None
+        self._shared = (None, None)
+
+    def contour(self, image, values, computeNormals=True):
+        """
+        vtkPolyData of the isovalues of image, or None when the volume is
+        too thin to split.
+        """
+        extent = image.GetExtent()
+        slabs = slab_extents(extent[5] - extent[4] + 1,
+                             min(self.process_count(), (extent[5] - extent[4]) // MIN_SLAB_CELLS))
+        if len(slabs) < 2:
+            return None
+        volume = self.shared_volume(image, computeNormals)
+        origin, spacing = image.GetOrigin(), image.GetSpacing()
+        tasks = []
+        for first, last in slabs:
+            # Planes this slab shares with its neighbours
+            shared = (first > 0, last < extent[5] - extent[4])
+            tasks.append((volume.specs, extent[:4] + (extent[4] + first, extent[4] + last), first, origin,
+                          spacing, list(values), computeNormals, shared))
+        pool = process_pool(self.process_count())
+        pieces = list(pool.map(contour_slab, *zip(*tasks)))
+        if all(piece is None for piece in pieces):
+            return vtkPolyData()
+        scalarName = image.GetPointData().GetScalars().GetName() or "scalars"
+        return pieces_to_polydata(*merge_pieces(pieces), scalarName=scalarName)
+
+
+class ParallelContourFilter(MultiContourFilter):
+    """
+    MultiContourFilter that contours z-slabs of the volume in a process pool.
+
+    Volumes too thin for two slabs of MIN_SLAB_CELLS are contoured in
+    process with flying edges.
+    """
+
+    def __init__(self, processes=None):
+        MultiContourFilter.__init__(self)
+        self.contourer = PieceContourer(processes)
+
+    def SetNumberOfProcesses(self, processes):
+        """
+        Worker processes (None: one per CPU).
+        """
+        self.contourer.processes = processes
+        self.Modified()
+
+    def GetNumberOfProcesses(self):
+        return self.contourer.process_count()
+
+    def RequestData(self, request, inInfo, outInfo):
+        image = vtkImageData.GetData(inInfo[0])
+        surface = self.contourer.contour(image, self.values, self.computeNormals) if self.values else None
+        if surface is None:
+            return MultiContourFilter.RequestData(self, request, inInfo, outInfo)
+        vtkPolyData.GetData(outInfo).ShallowCopy(surface)
+        return 1
+
+
+class ParallelIsosurfaceManager(IsosurfaceManager):
+    """
+    IsosurfaceManager whose missing isovalues are contoured in a process pool.
+    """
+
+    def __init__(self, cache=None, processes=None):
+        IsosurfaceManager.__init__(self, cache)
+        self.contourer = PieceContourer(processes)
+
+    def SetNumberOfProcesses(self, processes):
+        self.contourer.processes = processes
+        self.Modified()
+
+    def GetNumberOfProcesses(self):
+        return self.contourer.process_count()
+
+    def contour(self, image, value):
+        surface = self.contourer.contour(image, [value], self.computeNormals)
+        if surface is None:
+            return IsosurfaceManager.contour(self, image, value)
+        return surface
+
+
+def sampled_quadric(size, normals=False):
+    from quadric_sampler import QuadricSampler
+
+    sample = QuadricSampler()
+    sample.SetCache(None)
+    sample.SetCoefficients(0.5, 1, 0.2, 0, 0.1, 0, 0, 0.2, 0, 0)
+    sample.SetSampleDimensions(size, size, size)
+    sample.SetComputeNormals(normals)
+    sample.Update()
+    return sample.GetOutput()
+
+
+def point_stars(polyData):
+    """
+    Rows of (point, scalar, triangle count, hashes of the centroids of its
+    triangles) in sorted order: equal for two surfaces with the same points,
+    triangles and connectivity, whatever their numbering.
+    """
+    points = vtk_to_numpy(polyData.GetPoints().GetData()).astype(np.float64)
+    scalars = vtk_to_numpy(polyData.GetPointData().GetScalars()).astype(np.float64)
+    triangles = vtk_to_numpy(polyData.GetPolys().GetConnectivityArray()).reshape(-1, 3)
+    centroids = (np.round(points[triangles].mean(axis=1), 6) + 0.0).view(np.uint64)
+    hashes = np.repeat(centroids[:, 0] * np.uint64(0x9E3779B97F4A7C15) ^ centroids[:, 1] * np.uint64(0xC2B2AE3D27D4EB4F)
+                       ^ centroids[:, 2] * np.uint64(0x165667B19E3779F9), 3)
+    corners = triangles.reshape(-1)
+    # Sum and xor do not depend on the order of a point's triangles
+    sums = np.zeros(len(points), dtype=np.uint64)
+    xors = np.zeros(len(points), dtype=np.uint64)
+    np.add.at(sums, corners, hashes)
+    np.bitwise_xor.at(xors, corners, hashes)
+    rows = np.column_stack([points.view(np.uint64), scalars.view(np.uint64)[:, None],
+                            np.bincount(corners, minlength=len(points)).astype(np.uint64), sums, xors])
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def compare_with_single_pass(size=96, processes=(2, 3)):
+    """
+    Cases in which ParallelContourFilter and one MultiContourFilter pass
+    make different surfaces: spaced isovalues, and isovalues falling exactly
+    on samples of the planes the slabs share.
+    """
+    image = sampled_quadric(size, normals=True)
+    scalars = vtk_to_numpy(image.GetPointData().GetScalars()).reshape((size,) * 3)
+    mismatches = []
+    for count in processes:
+        seams = [last for first, last in slab_extents(size, count)[:-1]]
+        # A seam sample inside the quadric's surface range, and a z-minimum
+        # of the sampled function, whose z-edges both cross the isovalue
+        seamValues = [float(scalars[seams[0], size // 2, size // 3])]
+        minima = (scalars[seams] < scalars[[z - 1 for z in seams]]) & (scalars[seams] < scalars[[z + 1 for z in seams]])
+        if minima.any():
+            seamValues.append(float(scalars[seams][minima][len(scalars[seams][minima]) // 2]))
+        for values in [None, seamValues]:
+            for normals in (False, True):
+                surfaces = []
+                for algorithm in (MultiContourFilter(), ParallelContourFilter(count)):
+                    algorithm.SetInputDataObject(image)
+                    algorithm.SetComputeNormals(normals)
+                    if values is None:
+                        algorithm.GenerateValues(5, 0.0, 1.2)
+                    else:
+                        for i, value in enumerate(values):
+                            algorithm.SetValue(i, value)
+                    algorithm.Update()
+                    surfaces.append(algorithm.GetOutputDataObject(0))
+                single, parallel = surfaces
+                if (single.GetNumberOfPoints() != parallel.GetNumberOfPoints()
+                        or single.GetNumberOfCells() != parallel.GetNumberOfCells()
+                        or not np.array_equal(point_stars(single), point_stars(parallel))):
+                    mismatches.append((count, values or "GenerateValues(5, 0.0, 1.2)", normals,
+                                       single.GetNumberOfPoints(), parallel.GetNumberOfPoints()))
+    return mismatches
+
+
+def benchmark(size, contours, processes, repeat=3):
+    image = sampled_quadric(size)
+
+    def measure(algorithm):
+        algorithm.SetInputDataObject(image)
+        best = float("inf")
+        for i in range(repeat):
+            # New isovalues each time, as in a parameter sweep; the last
+            # run has the reported ones
+            algorithm.GenerateValues(contours, 0.0, 1.2 + 0.01 * (repeat - 1 - i))
+            start = time.perf_counter()
+            algorithm.Update()
+            best = min(best, time.perf_counter() - start)
+        output = algorithm.GetOutputDataObject(0)
+        return best, output.GetNumberOfPoints(), output.GetNumberOfCells()
+
+    print("%d^3 volume, %d isovalues, best of %d, %d CPUs" % (size, contours, repeat, os.cpu_count()))
+    seconds, points, cells = measure(MultiContourFilter())
+    print("  %-24s %8.3f s  %9d points  %9d triangles" % ("flying edges", seconds, points, cells))
+    for count in processes:
+        contour = ParallelContourFilter(count)
+        seconds, points, cells = measure(contour)
+        print("  %-24s %8.3f s  %9d points  %9d triangles" % ("%d process(es)" % count, seconds, points, cells))
+        contour.contourer.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ParallelContourFilter against MultiContourFilter.")
+    parser.add_argument("--size", type=int, default=256, help="samples per axis")
+    parser.add_argument("--contours", type=int, default=5)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true",
+                        help="compare the surfaces with a single pass instead, including isovalues on slab seams")
+    args = parser.parse_args(argv)
+    if args.check:
+        mismatches = compare_with_single_pass()
+        for count, values, normals, single, parallel in mismatches:
+            print("%d processes, isovalues %s, normals %s: %d points, %d in one pass"
+                  % (count, values, normals, parallel, single))
+        print("%d cases differ from a single pass" % len(mismatches))
+        sys.exit(1 if mismatches else 0)
+    benchmark(args.size, args.contours, args.processes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
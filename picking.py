@@ -0,0 +1,206 @@
+import numpy as np
+
+# Parts per BVH leaf
+LEAF_SIZE = 4
+
+
+def display_ray(renderer, x, y):
+    """
+    World-space origin and direction of the ray through display pixel (x, y).
+
+    The ray runs from the near plane (t = 0) to the far plane (t = 1).
+    """
+    ends = []
+    for depth in (0.0, 1.0):
+        renderer.SetDisplayPoint(x, y, depth)
+        renderer.DisplayToWorld()
+        point = np.array(renderer.GetWorldPoint())
+        ends.append(point[:3] / point[3])
+    return ends[0], ends[1] - ends[0]
+
+
+def slab_intersections(lo, hi, origins, directions):
+    """
+    Ray/box slab test for (N, 3) boxes and (N, 3) or (3,) rays.
+
+    Returns the entry parameter per box, or inf where the ray misses it or
+    the box lies entirely behind the origin.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1.0 / directions
+        t0 = (lo - origins) * inverse
+        t1 = (hi - origins) * inverse
+    # A zero direction component gives nan when the origin lies on a slab
+    # plane; treat it as inside the slab
+    near = np.nan_to_num(np.minimum(t0, t1), nan=-np.inf).max(axis=-1)
+    far = np.nan_to_num(np.maximum(t0, t1), nan=np.inf).min(axis=-1)
+    hit = (far >= np.maximum(near, 0.0))
+    return np.where(hit, np.maximum(near, 0.0), np.inf)
+
+
+class PickIndex(object):
+    """
+    Analytic picking of actors by their oriented bounding boxes.
+
+    Every part is the model-space bounding box of its mapper's input, placed
+    in the world by the actor's matrix (position, orientation and user
+    transform), i.e. an oriented box. The world-space bounds of those boxes
+    are kept in a bounding-volume hierarchy stored in flat arrays; the tree is
+    built when parts are added and only refitted when they move. A pick casts
+    the camera ray through the pixel against the tree and then against the
+    oriented boxes of the candidate parts; nothing is rendered.
+
+    `ids` maps an actor to its part id in O(1).
+    """
+
+    def __init__(self):
+        self.actors = []
+        self.partIds = []
+        self.ids = {}
+        self.localBounds = np.zeros((0, 2, 3))
+        self.world = np.zeros((0, 4, 4))
+        self.inverse = np.zeros((0, 4, 4))
+        self._dirty = True
+
+    def __len__(self):
+        return len(self.actors)
+
+    def add(self, actor, partId):
+        bounds = np.array(actor.GetMapper().GetBounds(), dtype=float).reshape(3, 2).T
+        self.actors.append(actor)
+        self.partIds.append(partId)
+        self.ids[actor] = partId
+        self.localBounds = np.concatenate([self.localBounds, bounds[None]])
+        self._dirty = True
+
+    def clear(self):
+        self.__init__()
+
+    def world_bounds(self):
+        """
+        (N, 2, 3) world-space axis-aligned bounds of every part's oriented box.
+        """
+        center = 0.5 * (self.localBounds[:, 0] + self.localBounds[:, 1])
+        half = 0.5 * (self.localBounds[:, 1] - self.localBounds[:, 0])
+        rotation = self.world[:, :3, :3]
+        worldCenter = np.einsum("nij,nj->ni", rotation, center) + self.world[:, :3, 3]
+        worldHalf = np.einsum("nij,nj->ni", np.abs(rotation), half)
+        return np.stack([worldCenter - worldHalf, worldCenter + worldHalf], axis=1)
+
+    def _build(self, bounds):
+        # Median split on the longest axis of the box centers. Nodes are
+        # stored in pre-order, so every child index is larger than its parent's
+        centers = bounds.mean(axis=1)
+        order = np.arange(len(bounds))
+        left, right, start, count, depth = [], [], [], [], []
+        stack = [(0, len(bounds), 0, None, left)]
+        while stack:
+            first, last, level, parent, link = stack.pop()
+            node = len(left)
+            if parent is not None:
+                link[parent] = node
+            left.append(-1)
+            right.append(-1)
+            start.append(first)
+            count.append(last - first)
+            depth.append(level)
+            if last - first <= LEAF_SIZE:
+                continue
+            part = order[first:last]
+            span = centers[part]
+            axis = np.argmax(span.max(axis=0) - span.min(axis=0))
+            order[first:last] = part[np.argsort(span[:, axis], kind="stable")]
+            middle = (first + last) // 2
+            stack.append((middle, last, level + 1, node, right))
+            stack.append((first, middle, level + 1, node, left))
+        self.order = order
+        self.left = np.array(left, dtype=np.intp)
+        self.right = np.array(right, dtype=np.intp)
+        self.start = np.array(start, dtype=np.intp)
+        self.count = np.array(count, dtype=np.intp)
+        self.depth = np.array(depth, dtype=np.intp)
+        self.leaves = np.flatnonzero(self.left < 0)
+        # Plain lists are faster than array indexing in the traversal loop
+        self._leftList = left
+        self._rightList = right
+        self.nodeBounds = np.zeros((len(left), 2, 3))
+        self._dirty = False
+
+    def _refit(self, bounds):
+        ordered = bounds[self.order]
+        starts = self.start[self.leaves]
+        self.nodeBounds[self.leaves, 0] = np.minimum.reduceat(ordered[:, 0], starts)
+        self.nodeBounds[self.leaves, 1] = np.maximum.reduceat(ordered[:, 1], starts)
+        # Deepest internal nodes first, one vectorized step per level
+        internal = np.flatnonzero(self.left >= 0)
+        for level in range(self.depth.max() - 1, -1, -1):
+            nodes = internal[self.depth[internal] == level]
+            if not len(nodes):
+                continue
+            leftBounds = self.nodeBounds[self.left[nodes]]
+            rightBounds = self.nodeBounds[self.right[nodes]]
+            self.nodeBounds[nodes, 0] = np.minimum(leftBounds[:, 0], rightBounds[:, 0])
+            self.nodeBounds[nodes, 1] = np.maximum(leftBounds[:, 1], rightBounds[:, 1])
+
+    def update(self):
+        """
+        Read the actors' current matrices and refit the hierarchy.
+        """
+        if not self.actors:
+            return
+        self.world = np.array([actor.GetMatrix().GetData() for actor in self.actors]).reshape(-1, 4, 4)
+        self.inverse = np.linalg.inv(self.world)
+        bounds = self.world_bounds()
+        if self._dirty:
+            self._build(bounds)
+        self._refit(bounds)
+
+    def intersect(self, origin, direction):
+        """
+        Closest part hit by the ray origin + t * direction (t >= 0).
+
+        Returns (part index, t), or (None, inf) when nothing is hit.
+        """
+        if not self.actors:
+            return None, np.inf
+        # All node boxes are tested in one vectorized pass; the walk then only
+        # descends into nodes the ray hits and collects the parts of the hit
+        # leaves, whose oriented boxes are tested together at the end
+        hit = np.isfinite(slab_intersections(self.nodeBounds[:, 0], self.nodeBounds[:, 1], origin, direction))
+        if not hit[0]:
+            return None, np.inf
+        hit, left, right = hit.tolist(), self._leftList, self._rightList
+        leaves = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if left[node] < 0:
+                leaves.append(node)
+                continue
+            if hit[left[node]]:
+                stack.append(left[node])
+            if hit[right[node]]:
+                stack.append(right[node])
+        if not leaves:
+            return None, np.inf
+
+        parts = np.concatenate([self.order[self.start[leaf] : self.start[leaf] + self.count[leaf]] for leaf in leaves])
+        inverse = self.inverse[parts]
+        localOrigins = np.einsum("nij,j->ni", inverse[:, :3, :3], origin) + inverse[:, :3, 3]
+        localDirections = np.einsum("nij,j->ni", inverse[:, :3, :3], direction)
+        partT = slab_intersections(self.localBounds[parts, 0], self.localBounds[parts, 1], localOrigins, localDirections)
+        closest = np.argmin(partT)
+        if not np.isfinite(partT[closest]):
+            return None, np.inf
+        return parts[closest], partT[closest]
+
+    def pick(self, renderer, x, y):
+        """
+        (part id, actor) under display position (x, y), or (None, None).
+        """
+        self.update()
+        origin, direction = display_ray(renderer, x, y)
+        part, _ = self.intersect(origin, direction)
+        if part is None:
+            return None, None
+        return self.partIds[part], self.actors[part]
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
-import vtk
+import sys
+
+import vtk_lazy as vtk
 
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkRenderingOpenGL2
@@ -18,6 +20,8 @@ from vtkmodules.vtkRenderingCore import (
     vtkRenderer,
 )
 
+import render_stats
+
 
 colors = vtkNamedColors()
 NUMBER_OF_SPHERES = 10
@@ -102,25 +106,11 @@ class MouseInteractorHighLightActor(vtkInteractorStyleTrackballCamera):
         return
 
 
-def main():
-    # A renderer and render window
+def create_arm_renderer():
+    # A renderer holding the arm, forearm and hand chained by transforms
     renderer = vtkRenderer()
     renderer.SetBackground(colors.GetColor3d("SteelBlue"))
 
-    # renwin = vtkRenderWindow()
-    renwin.AddRenderer(renderer)
-    renwin.SetSize(640, 480)
-    renwin.SetWindowName("HighlightPickedActor")
-
-    # An interactor
-    interactor = vtkRenderWindowInteractor()
-    interactor.SetRenderWindow(renwin)
-
-    # add the custom style
-    style = MouseInteractorHighLightActor()
-    style.SetDefaultRenderer(renderer)
-    interactor.SetInteractorStyle(style)
-
     arm = vtk.vtkCylinderSource()
     arm.SetRadius(8)
     arm.SetHeight(20)
@@ -179,6 +169,28 @@ def main():
     renderer.AddActor(forearmActor)
     renderer.AddActor(handActor)
 
+    return renderer
+
+
+def main():
+    # A renderer and render window
+    renderer = create_arm_renderer()
+
+    # renwin = vtkRenderWindow()
+    renwin.AddRenderer(renderer)
+    renwin.SetSize(640, 480)
+    renwin.SetWindowName("HighlightPickedActor")
+
+    # An interactor
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(renwin)
+
+    # add the custom style
+    style = MouseInteractorHighLightActor()
+    style.SetDefaultRenderer(renderer)
+    interactor.SetInteractorStyle(style)
+
+    render_stats.attach(renwin, sys.argv)
     renwin.Render()
 
     # i = 0
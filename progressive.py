@@ -0,0 +1,170 @@
+"""
+Progressive sampling and contouring of a quadric isosurface.
+
+The coarsest level (16^3 by default) is sampled and contoured synchronously,
+so the first frame never waits for the full resolution. The finer levels
+(50^3, 128^3, 256^3) are computed one after the other on a background
+thread; NumPy and the VTK filters release the GIL, so the interactor keeps
+running. ProgressiveIsosurface is an animation for AnimationScheduler: every
+tick it swaps the newest finished level into the actor's mapper.
+
+Changing the coefficients starts a new generation. Work of older
+generations is abandoned at the next level boundary and their results are
+dropped, so refinements that were superseded never reach the screen.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkRenderingCore import vtkPolyDataMapper
+
+from contouring import MultiContourFilter
+from quadric_sampler import QuadricSampler
+
+LEVELS = (16, 50, 128, 256)
+
+
+def extract_isosurface(coefficients, dimension, values, bounds=(-1.0, 1.0, -1.0, 1.0, -1.0, 1.0), cancelled=None):
+    """
+    Isosurfaces of a quadric sampled on a dimension^3 grid, or None when
+    cancelled() turned true after sampling.
+    """
+    sample = QuadricSampler()
+    # Throwaway levels would fill the on-disk volume cache and evict real entries
+    sample.SetCache(None)
+    sample.SetCoefficients(coefficients)
+    sample.SetSampleDimensions(dimension, dimension, dimension)
+    sample.SetModelBounds(bounds)
+    # The contour normals come from the scalars' gradient
+    sample.ComputeNormalsOff()
+    sample.Update()
+    if cancelled is not None and cancelled():
+        return None
+
+    contour = MultiContourFilter()
+    contour.SetInputConnection(sample.GetOutputPort())
+    for i, value in enumerate(values):
+        contour.SetValue(i, value)
+    contour.Update()
+    surface = vtkPolyData()
+    surface.ShallowCopy(contour.GetOutput())
+    return surface
+
+
+class ProgressiveIsosurface(object):
+    """
+    Isosurface of a quadric on an actor, refined level by level.
+
+    Add it to an AnimationScheduler to receive the refinements; it finishes
+    once the finest level is shown and is added again by SetCoefficients().
+    Without a scheduler, wait() blocks until the finest level is shown.
+    """
+
+    def __init__(self, actor, coefficients, values, levels=LEVELS, bounds=(-1.0, 1.0, -1.0, 1.0, -1.0, 1.0),
+                 scheduler=None):
+        self.actor = actor
+        self.values = [float(value) for value in values]
+        self.levels = tuple(levels)
+        self.bounds = tuple(bounds)
+        self.scheduler = scheduler
+        self.level = None
+        self.generation = 0
+        self.results = queue.Queue()
+        self.running = False
+        self.lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        if actor.GetMapper() is None:
+            actor.SetMapper(vtkPolyDataMapper())
+        self.SetCoefficients(coefficients)
+
+    def SetCoefficients(self, *coefficients):
+        if len(coefficients) == 1:
+            coefficients = coefficients[0]
+        self.coefficients = tuple(float(c) for c in coefficients)
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+
+        self.show(self.levels[0], extract_isosurface(self.coefficients, self.levels[0], self.values, self.bounds))
+        if len(self.levels) > 1:
+            self.worker.submit(self.refine, generation, self.coefficients)
+            if self.scheduler is not None and not self.running:
+                self.running = True
+                self.scheduler.add(self)
+
+    def attach(self, scheduler):
+        """
+        Deliver the refinements through scheduler from now on.
+        """
+        self.scheduler = scheduler
+        if not self.done() and not self.running:
+            self.running = True
+            scheduler.add(self)
+
+    def cancelled(self, generation):
+        with self.lock:
+            return generation != self.generation
+
+    def refine(self, generation, coefficients):
+        # Runs on the worker thread
+        for dimension in self.levels[1:]:
+            if self.cancelled(generation):
+                return
+            surface = extract_isosurface(coefficients, dimension, self.values, self.bounds,
+                                         lambda: self.cancelled(generation))
+            if surface is None:
+                return
+            self.results.put((generation, dimension, surface))
+
+    def show(self, dimension, surface):
+        self.actor.GetMapper().SetInputData(surface)
+        self.level = dimension
+
+    def poll(self):
+        """
+        Show the newest finished level of the current generation, if any.
+
+        Returns True when something was swapped in.
+        """
+        newest = None
+        while True:
+            try:
+                generation, dimension, surface = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.generation:
+                newest = (dimension, surface)
+        if newest is None:
+            return False
+        self.show(*newest)
+        return True
+
+    def done(self):
+        return self.level == self.levels[-1]
+
+    def wait(self):
+        while not self.done():
+            generation, dimension, surface = self.results.get()
+            if generation == self.generation:
+                self.show(dimension, surface)
+
+    def start(self, now):
+        pass
+
+    def step(self, now):
+        self.poll()
+        if self.done():
+            self.running = False
+            return True
+        return False
+
+    def shutdown(self):
+        """
+        Abandon the refinement in flight and drop the queued ones, so closing
+        the window does not wait for the finer levels.
+        """
+        with self.lock:
+            self.generation += 1
+        self.worker.shutdown(wait=False, cancel_futures=True)
@@ -8,19 +8,17 @@ import vtkmodules.vtkInteractionStyle
 import vtkmodules.vtkRenderingOpenGL2
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonDataModel import vtkQuadric
-from vtkmodules.vtkFiltersCore import vtkAppendFilter, vtkContourFilter
-from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
-from vtkmodules.vtkImagingCore import vtkExtractVOI
-from vtkmodules.vtkImagingHybrid import vtkSampleFunction
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
-    vtkDataSetMapper,
-    vtkPolyDataMapper,
     vtkRenderWindow,
     vtkRenderWindowInteractor,
     vtkRenderer,
 )
 
+from brick_index import BrickedContourFilter
+from quadric_pipeline import PipelineCache, create_contours, create_isosurface, create_outline, create_planes
+from quadric_sampler import QuadricSampler
+
 
 def main():
     colors = vtkNamedColors()
@@ -42,26 +40,29 @@ def main():
     quadric = vtkQuadric()
     quadric.SetCoefficients(1, 2, 3, 0, 1, 0, 0, 0, 0, 0)
 
-    sample = vtkSampleFunction()
+    sample = QuadricSampler()
     sample.SetSampleDimensions(25, 25, 25)
     sample.SetImplicitFunction(quadric)
 
+    # Filters and mappers shared by this scene's actors
+    pipelines = PipelineCache()
+
     isoActor = vtkActor()
-    CreateIsosurface(sample, isoActor)
+    create_isosurface(sample, isoActor, contourClass=BrickedContourFilter, pipelines=pipelines)
     outlineIsoActor = vtkActor()
-    CreateOutline(sample, outlineIsoActor)
+    create_outline(sample, outlineIsoActor, pipelines)
 
     planesActor = vtkActor()
-    CreatePlanes(sample, planesActor, 3)
+    create_planes(sample, planesActor, 3, pipelines)
     outlinePlanesActor = vtkActor()
-    CreateOutline(sample, outlinePlanesActor)
+    create_outline(sample, outlinePlanesActor, pipelines)
     planesActor.AddPosition(isoActor.GetBounds()[0] * 2.0, 0, 0)
     outlinePlanesActor.AddPosition(isoActor.GetBounds()[0] * 2.0, 0, 0)
 
     contourActor = vtkActor()
-    CreateContours(sample, contourActor, 3, 15)
+    create_contours(sample, contourActor, 3, 15, pipelines)
     outlineContourActor = vtkActor()
-    CreateOutline(sample, outlineContourActor)
+    create_outline(sample, outlineContourActor, pipelines)
     contourActor.AddPosition(isoActor.GetBounds()[0] * 4.0, 0, 0.8)
     outlineContourActor.AddPosition(isoActor.GetBounds()[0] * 4.0, 0, 0)
 
@@ -94,95 +95,5 @@ def main():
     interactor.Start()
 
 
-def CreateIsosurface(func, actor, numberOfContours=5):
-    # Generate implicit surface.
-    contour = vtkContourFilter()
-    contour.SetInputConnection(func.GetOutputPort())
-    ranges = [1.0, 3.0]
-    contour.GenerateValues(numberOfContours, ranges)
-
-    # Map contour
-    contourMapper = vtkPolyDataMapper()
-    contourMapper.SetInputConnection(contour.GetOutputPort())
-    contourMapper.SetScalarRange(0, 9)
-
-    actor.SetMapper(contourMapper)
-    return
-
-
-def CreatePlanes(func, actor, numberOfPlanes):
-    #
-    # Extract planes from implicit function.
-    #
-
-    append = vtkAppendFilter()
-
-    dims = func.GetSampleDimensions()
-    sliceIncr = (dims[2] - 1) // (numberOfPlanes + 1)
-    sliceNum = -4
-    for i in range(0, numberOfPlanes):
-        extract = vtkExtractVOI()
-        extract.SetInputConnection(func.GetOutputPort())
-        extract.SetVOI(
-            0, dims[0] - 1, 0, dims[1] - 1, sliceNum + sliceIncr, sliceNum + sliceIncr
-        )
-        append.AddInputConnection(extract.GetOutputPort())
-        sliceNum += sliceIncr
-    append.Update()
-
-    # Map planes
-    planesMapper = vtkDataSetMapper()
-    planesMapper.SetInputConnection(append.GetOutputPort())
-    planesMapper.SetScalarRange(0, 4)
-
-    actor.SetMapper(planesMapper)
-    actor.GetProperty().SetAmbient(1.0)
-    return
-
-
-def CreateContours(func, actor, numberOfPlanes, numberOfContours):
-    #
-    # Extract planes from implicit function
-    #
-
-    append = vtkAppendFilter()
-
-    dims = func.GetSampleDimensions()
-    sliceIncr = (dims[2] - 1) // (numberOfPlanes + 1)
-
-    sliceNum = -4
-    for i in range(0, numberOfPlanes):
-        extract = vtkExtractVOI()
-        extract.SetInputConnection(func.GetOutputPort())
-        extract.SetVOI(
-            0, dims[0] - 1, 0, dims[1] - 1, sliceNum + sliceIncr, sliceNum + sliceIncr
-        )
-        ranges = [1.0, 6.0]
-        contour = vtkContourFilter()
-        contour.SetInputConnection(extract.GetOutputPort())
-        contour.GenerateValues(numberOfContours, ranges)
-        append.AddInputConnection(contour.GetOutputPort())
-        sliceNum += sliceIncr
-    append.Update()
-
-    # Map planes
-    planesMapper = vtkDataSetMapper()
-    planesMapper.SetInputConnection(append.GetOutputPort())
-    planesMapper.SetScalarRange(0, 7)
-
-    actor.SetMapper(planesMapper)
-    actor.GetProperty().SetAmbient(1.0)
-    return
-
-
-def CreateOutline(source, actor):
-    outline = vtkOutlineFilter()
-    outline.SetInputConnection(source.GetOutputPort())
-    mapper = vtkPolyDataMapper()
-    mapper.SetInputConnection(outline.GetOutputPort())
-    actor.SetMapper(mapper)
-    return
-
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,126 @@
+"""
+Shared pipelines for visualizing a sampled quadric: isosurface, planes,
+contour lines and outline.
+
+Filters and mappers are memoized on (type, inputs, parameters) in a
+PipelineCache, so asking twice for the same filter on the same input
+returns the same object and its output is computed once. Actors that show
+the same geometry at different positions (the three outlines of the
+quadric demos) share one mapper; only their transforms differ.
+
+A scene owns its PipelineCache and passes it to every create_* call; the
+pipelines go away with the scene, and scenes never share (or modify)
+each other's filters. Without a cache the helpers build unshared
+pipelines.
+"""
+
+from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
+from vtkmodules.vtkRenderingCore import vtkPolyDataMapper
+
+from contouring import MultiContourFilter
+from slices import SliceContours, SliceStack, plane_indices
+
+
+def pipeline_key(vtkClass, inputs, **params):
+    return (vtkClass.__name__, inputs) + tuple(sorted(params.items()))
+
+
+class PipelineCache(object):
+    """
+    Filters and mappers of one scene, keyed on (type, inputs, parameters).
+    """
+
+    def __init__(self):
+        self.algorithms = {}
+
+    def __len__(self):
+        return len(self.algorithms)
+
+    def memoized(self, vtkClass, inputs, **params):
+        """
+        Return this scene's instance of vtkClass connected to inputs.
+
+        inputs is an algorithm or a tuple of algorithms whose output ports
+        are added in order. Parameters are method calls applied once, e.g.
+        SetVOI=(0, 24, 0, 24, 2, 2) or GenerateValues=(5, 1.0, 3.0); tuple
+        values are passed as separate arguments.
+        """
+        if not isinstance(inputs, tuple):
+            inputs = (inputs,)
+        key = pipeline_key(vtkClass, inputs, **params)
+        algorithm = self.algorithms.get(key)
+        if algorithm is None:
+            algorithm = vtkClass()
+            for name, value in params.items():
+                if isinstance(value, tuple):
+                    getattr(algorithm, name)(*value)
+                else:
+                    getattr(algorithm, name)(value)
+            if len(inputs) == 1:
+                algorithm.SetInputConnection(inputs[0].GetOutputPort())
+            else:
+                for source in inputs:
+                    algorithm.AddInputConnection(source.GetOutputPort())
+            self.algorithms[key] = algorithm
+        return algorithm
+
+    def clear(self):
+        self.algorithms.clear()
+
+
+def create_isosurface(func, actor, numberOfContours=5, contourClass=None, processes=None, pipelines=None):
+    # Generate implicit surface; with processes (0: one per CPU) the volume is
+    # contoured on a process pool by one of the filters of parallel_contour.py
+    params = dict(GenerateValues=(numberOfContours, 1.0, 3.0))
+    if processes is not None:
+        if contourClass is None:
+            # Imported here, so scenes without a pool skip multiprocessing
+            from parallel_contour import ParallelContourFilter
+
+            contourClass = ParallelContourFilter
+        elif not hasattr(contourClass, "SetNumberOfProcesses"):
+            raise ValueError("%s cannot contour on a process pool; use a filter from parallel_contour.py"
+                             % contourClass.__name__)
+        params["SetNumberOfProcesses"] = processes or None
+    elif contourClass is None:
+        contourClass = MultiContourFilter
+    pipelines = pipelines if pipelines is not None else PipelineCache()
+    contour = pipelines.memoized(contourClass, func, **params)
+
+    # Map contour
+    actor.SetMapper(pipelines.memoized(vtkPolyDataMapper, contour, SetScalarRange=(0, 9)))
+    return
+
+
+def create_planes(func, actor, numberOfPlanes, pipelines=None):
+    # Slices of the sampled volume as quad grids, without per-plane filters
+    pipelines = pipelines if pipelines is not None else PipelineCache()
+    indices = plane_indices(func.GetSampleDimensions()[2], numberOfPlanes)
+    planes = pipelines.memoized(SliceStack, func, SetSliceIndices=tuple(indices))
+    planes.Update()
+
+    # Map planes
+    actor.SetMapper(pipelines.memoized(vtkPolyDataMapper, planes, SetScalarRange=(0, 4)))
+    actor.GetProperty().SetAmbient(1.0)
+    return
+
+
+def create_contours(func, actor, numberOfPlanes, numberOfContours, pipelines=None):
+    # Isolines of the same planes that create_planes shows
+    pipelines = pipelines if pipelines is not None else PipelineCache()
+    indices = plane_indices(func.GetSampleDimensions()[2], numberOfPlanes)
+    contours = pipelines.memoized(SliceContours, func, SetSliceIndices=tuple(indices),
+                                  GenerateValues=(numberOfContours, 1.0, 6.0))
+    contours.Update()
+
+    # Map contours
+    actor.SetMapper(pipelines.memoized(vtkPolyDataMapper, contours, SetScalarRange=(0, 7)))
+    actor.GetProperty().SetAmbient(1.0)
+    return
+
+
+def create_outline(source, actor, pipelines=None):
+    pipelines = pipelines if pipelines is not None else PipelineCache()
+    outline = pipelines.memoized(vtkOutlineFilter, source)
+    actor.SetMapper(pipelines.memoized(vtkPolyDataMapper, outline))
+    return
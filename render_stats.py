@@ -0,0 +1,267 @@
+"""
+Opt-in render latency instrumentation.
+
+Set RENDER_STATS=1 (or pass --render-stats) to time every Render() of a
+window. StartEvent/EndEvent observers on the window, its renderers and the
+mappers of their actors record one row per frame into a fixed-size ring
+buffer; a text overlay shows FPS, p50/p95/p99 frame time and the triangle
+count, and a histogram is printed on exit. With RENDER_STATS=<file>.json
+the summary and histogram are written to that file instead.
+
+Timings are CPU-side: they measure how long VTK takes to issue a frame,
+not when the GPU finishes it.
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkCommonDataModel import vtkDataObject
+from vtkmodules.vtkRenderingCore import vtkGlyph3DMapper, vtkRenderer, vtkTextActor
+
+from lod import triangle_count
+
+ENVIRONMENT_VARIABLE = "RENDER_STATS"
+COMMAND_LINE_FLAG = "--render-stats"
+
+# Columns of the per-frame ring buffer
+COLUMNS = ("start", "window_ms", "renderers_ms", "mappers_ms", "triangles")
+HISTOGRAM_EDGES_MS = (0.0, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 50.0, 100.0, 250.0, float("inf"))
+OVERLAY_INTERVAL = 0.25
+
+
+def enabled(argv=None):
+    return bool(os.environ.get(ENVIRONMENT_VARIABLE)) or (argv is not None and COMMAND_LINE_FLAG in argv)
+
+
+def glyph_source_indices(mapper, points, sources):
+    # Source of every glyph, clamped to the connected sources like the mapper does
+    if sources == 1 or not mapper.GetSourceIndexing():
+        return np.zeros(points.GetNumberOfPoints(), dtype=int)
+    name = mapper.GetInputArrayInformation(vtkGlyph3DMapper.SOURCE_INDEX).Get(vtkDataObject.FIELD_NAME())
+    array = points.GetPointData().GetArray(name) if name else None
+    if array is None:
+        return np.zeros(points.GetNumberOfPoints(), dtype=int)
+    values = vtk_to_numpy(array).reshape(points.GetNumberOfPoints(), -1)
+    return np.clip(np.linalg.norm(values, axis=1).astype(int), 0, sources - 1)
+
+
+def mapper_triangles(mapper):
+    if mapper.IsA("vtkGlyph3DMapper"):
+        points = mapper.GetInputDataObject(0, 0)
+        sources = mapper.GetNumberOfInputConnections(1)
+        if points is None or not sources:
+            return 0
+        perSource = np.array([triangle_count(mapper, 1, i) for i in range(sources)])
+        return int(perSource[glyph_source_indices(mapper, points, sources)].sum())
+    return triangle_count(mapper)
+
+
+class RingBuffer(object):
+    """
+    Fixed-size buffer of float rows; the oldest rows are overwritten.
+    """
+
+    def __init__(self, capacity, width):
+        self.data = np.zeros((capacity, width))
+        self.count = 0
+
+    def append(self, row):
+        self.data[self.count % len(self.data)] = row
+        self.count += 1
+
+    def values(self):
+        """
+        Stored rows, oldest first.
+        """
+        if self.count <= len(self.data):
+            return self.data[: self.count]
+        head = self.count % len(self.data)
+        return np.concatenate([self.data[head:], self.data[:head]])
+
+
+class RenderStats(object):
+    """
+    Per-frame timings of a vtkRenderWindow.
+
+    Mappers are discovered when their renderer starts drawing, so actors and
+    mappers added or swapped later (e.g. by LODManager) are timed as well.
+    """
+
+    def __init__(self, renderWindow, capacity=2048, overlay=True):
+        self.renderWindow = renderWindow
+        self.frames = RingBuffer(capacity, len(COLUMNS))
+        self.renderers = {}
+        self.mappers = {}
+        self.frameStart = None
+        self.rendererTime = 0.0
+        self.mapperTime = 0.0
+        self.triangles = 0
+        self.overlayTime = 0.0
+        self.text = None
+
+        renderWindow.AddObserver("StartEvent", self.onWindowStart)
+        renderWindow.AddObserver("EndEvent", self.onWindowEnd)
+        renderers = renderWindow.GetRenderers()
+        renderers.InitTraversal()
+        for _ in range(renderers.GetNumberOfItems()):
+            self.watch_renderer(renderers.GetNextItem())
+        if overlay:
+            self.add_overlay()
+
+    def watch_renderer(self, renderer):
+        if id(renderer) in self.renderers:
+            return
+        state = {"start": 0.0}
+
+        def onStart(obj, event):
+            state["start"] = time.perf_counter()
+            self.watch_actors(obj)
+
+        def onEnd(obj, event):
+            self.rendererTime += time.perf_counter() - state["start"]
+
+        renderer.AddObserver("StartEvent", onStart)
+        renderer.AddObserver("EndEvent", onEnd)
+        self.renderers[id(renderer)] = renderer
+
+    def watch_actors(self, renderer):
+        actors = renderer.GetActors()
+        actors.InitTraversal()
+        for _ in range(actors.GetNumberOfItems()):
+            actor = actors.GetNextActor()
+            mapper = actor.GetMapper()
+            if mapper is None:
+                continue
+            if id(mapper) not in self.mappers:
+                self.watch_mapper(mapper)
+            if actor.GetVisibility():
+                self.triangles += mapper_triangles(mapper)
+
+    def watch_mapper(self, mapper):
+        # Keeping the mapper in its state also keeps its id() unique
+        state = {"start": 0.0, "mapper": mapper}
+
+        def onStart(obj, event):
+            state["start"] = time.perf_counter()
+
+        def onEnd(obj, event):
+            self.mapperTime += time.perf_counter() - state["start"]
+
+        mapper.AddObserver("StartEvent", onStart)
+        mapper.AddObserver("EndEvent", onEnd)
+        self.mappers[id(mapper)] = state
+
+    def add_overlay(self):
+        # The text lives in its own non-interactive layer so pickers and
+        # camera interaction never see it
+        overlay = vtkRenderer()
+        overlay.SetLayer(self.renderWindow.GetNumberOfLayers())
+        overlay.InteractiveOff()
+        self.renderWindow.SetNumberOfLayers(self.renderWindow.GetNumberOfLayers() + 1)
+        self.text = vtkTextActor()
+        self.text.SetDisplayPosition(8, 8)
+        self.text.GetTextProperty().SetFontSize(14)
+        self.text.GetTextProperty().SetColor(1.0, 1.0, 0.0)
+        overlay.AddViewProp(self.text)
+        self.renderWindow.AddRenderer(overlay)
+        # Known before the observers run, so the overlay is not timed
+        self.renderers[id(overlay)] = overlay
+
+    def onWindowStart(self, obj, event):
+        self.frameStart = time.perf_counter()
+        self.rendererTime = 0.0
+        self.mapperTime = 0.0
+        self.triangles = 0
+
+    def onWindowEnd(self, obj, event):
+        if self.frameStart is None:
+            return
+        now = time.perf_counter()
+        self.frames.append(
+            (
+                self.frameStart,
+                1000.0 * (now - self.frameStart),
+                1000.0 * self.rendererTime,
+                1000.0 * self.mapperTime,
+                self.triangles,
+            )
+        )
+        self.frameStart = None
+        if self.text is not None and now - self.overlayTime > OVERLAY_INTERVAL:
+            self.overlayTime = now
+            self.text.SetInput(self.overlay_text(now))
+
+    def summary(self, now=None):
+        frames = self.frames.values()
+        if not len(frames):
+            return {"frames": 0}
+        now = time.perf_counter() if now is None else now
+        p50, p95, p99 = np.percentile(frames[:, 1], (50, 95, 99))
+        return {
+            "frames": self.frames.count,
+            "fps": int(np.count_nonzero(frames[:, 0] > now - 1.0)),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": frames[:, 1].max(),
+            "renderers_ms": frames[:, 2].mean(),
+            "mappers_ms": frames[:, 3].mean(),
+            "triangles": int(frames[-1, 4]),
+        }
+
+    def overlay_text(self, now=None):
+        stats = self.summary(now)
+        return "%d fps  p50 %.1f  p95 %.1f  p99 %.1f ms  %d tris" % (
+            stats["fps"], stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["triangles"]
+        )
+
+    def histogram(self):
+        counts, edges = np.histogram(self.frames.values()[:, 1], bins=HISTOGRAM_EDGES_MS)
+        return counts, edges
+
+    def dump(self, path=None):
+        """
+        Print the summary and frame-time histogram, or write them to a JSON file.
+        """
+        stats = self.summary()
+        if not stats["frames"]:
+            return
+        counts, edges = self.histogram()
+        if path:
+            stats["histogram"] = {"edges_ms": [float(e) for e in edges[:-1]], "counts": counts.tolist()}
+            with open(path, "w") as f:
+                json.dump(stats, f, indent=4, default=float)
+            return
+        out = sys.stderr
+        out.write(
+            "render stats: %d frames, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms\n"
+            % (stats["frames"], stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"])
+        )
+        out.write(
+            "  renderers %.2f ms, mappers %.2f ms per frame, %d triangles\n"
+            % (stats["renderers_ms"], stats["mappers_ms"], stats["triangles"])
+        )
+        width = max(counts.max(), 1)
+        for low, high, count in zip(edges[:-1], edges[1:], counts):
+            label = "%6.1f - %-6s ms" % (low, "inf" if np.isinf(high) else "%.1f" % high)
+            out.write("  %s %6d %s\n" % (label, count, "#" * int(round(40.0 * count / width))))
+
+
+def attach(renderWindow, argv=None, overlay=True):
+    """
+    Instrument renderWindow if RENDER_STATS or --render-stats asks for it.
+
+    Call after the renderers have been added. Returns the RenderStats, or None
+    when instrumentation is off.
+    """
+    if not enabled(argv):
+        return None
+    stats = RenderStats(renderWindow, overlay=overlay)
+    path = os.environ.get(ENVIRONMENT_VARIABLE, "")
+    atexit.register(stats.dump, path if path.endswith(".json") else None)
+    return stats
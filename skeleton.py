@@ -0,0 +1,307 @@
+import json
+import os
+
+import numpy as np
+from vtkmodules.vtkCommonMath import vtkMatrix4x4
+
+
+def euler_matrices(angles):
+    """
+    Rotation matrices for (..., 3) Euler angles in degrees.
+
+    The angles are (x, y, z) and are applied like transform() in 03Avatar.py,
+    i.e. the result is RotateZ * RotateY * RotateX. Returns (..., 4, 4).
+    """
+    radians = np.radians(np.asarray(angles, dtype=float))
+    cx, cy, cz = np.cos(radians[..., 0]), np.cos(radians[..., 1]), np.cos(radians[..., 2])
+    sx, sy, sz = np.sin(radians[..., 0]), np.sin(radians[..., 1]), np.sin(radians[..., 2])
+
+    m = np.zeros(radians.shape[:-1] + (4, 4))
+    m[..., 0, 0] = cz * cy
+    m[..., 0, 1] = cz * sy * sx - sz * cx
+    m[..., 0, 2] = cz * sy * cx + sz * sx
+    m[..., 1, 0] = sz * cy
+    m[..., 1, 1] = sz * sy * sx + cz * cx
+    m[..., 1, 2] = sz * sy * cx - cz * sx
+    m[..., 2, 0] = -sy
+    m[..., 2, 1] = cy * sx
+    m[..., 2, 2] = cy * cx
+    m[..., 3, 3] = 1.0
+    return m
+
+
+def transform_matrices(translate, rotate, scale=None):
+    """
+    Vectorized transform(): Translate * RotateZ * RotateY * RotateX * Scale.
+    """
+    m = euler_matrices(rotate)
+    if scale is not None:
+        m[..., :3, :3] *= np.asarray(scale, dtype=float)[..., None, :]
+    m[..., :3, 3] = translate
+    return m
+
+
+def vtk_matrix_to_numpy(matrix):
+    return np.array([[matrix.GetElement(row, column) for column in range(4)] for row in range(4)])
+
+
+class Skeleton(object):
+    """
+    Joint hierarchy with local transforms stored in contiguous NumPy arrays.
+
+    `parents[i]` is the parent joint index of joint i (-1 for roots) and
+    `local[i]` is its 4x4 transform relative to the parent. update() computes
+    all world matrices level by level, one batched matmul per tree depth, and
+    writes them to the bound actors and instances.
+    """
+
+    def __init__(self, names, parents, local):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.parents = np.asarray(parents, dtype=np.int32)
+        self.local = np.array(local, dtype=float)
+        self.rest = self.local.copy()
+        self.world = np.tile(np.eye(4), (len(self.parents), 1, 1))
+        self.levels = self._build_levels(self.parents)
+        children = np.flatnonzero(self.parents >= 0)
+        self.bones = np.stack([self.parents[children], children], axis=1)
+        self._matrices = []
+        self._instances = []
+
+    @staticmethod
+    def _build_levels(parents):
+        depth = np.full(len(parents), -1, dtype=np.int64)
+        depth[parents < 0] = 0
+        for level in range(len(parents)):
+            pending = depth < 0
+            if not pending.any():
+                break
+            ready = pending & (depth[parents] == level)
+            depth[ready] = level + 1
+        else:
+            if (depth < 0).any():
+                raise ValueError("joint hierarchy contains a cycle")
+
+        levels = []
+        for level in range(depth.max() + 1 if len(depth) else 0):
+            joints = np.flatnonzero(depth == level)
+            levels.append((joints, parents[joints]))
+        return levels
+
+    def __len__(self):
+        return len(self.names)
+
+    def joint(self, key):
+        if isinstance(key, str):
+            return self.index[key]
+        return key
+
+    def forward(self, local=None):
+        """
+        World matrices for `local`, which may carry leading batch dimensions.
+        """
+        if local is None:
+            local = self.local
+        world = np.empty_like(local)
+        roots, _ = self.levels[0]
+        world[..., roots, :, :] = local[..., roots, :, :]
+        for joints, parents in self.levels[1:]:
+            world[..., joints, :, :] = world[..., parents, :, :] @ local[..., joints, :, :]
+        return world
+
+    def rotate(self, key, x=0.0, y=0.0, z=0.0):
+        """
+        Append a rotation to a joint's local transform, like vtkTransform.RotateZ/Y/X.
+        """
+        i = self.joint(key)
+        self.local[i] = self.local[i] @ euler_matrices((x, y, z))
+
+    def set_rotation(self, key, x=0.0, y=0.0, z=0.0):
+        """
+        Set a joint's local transform to its rest transform followed by a rotation.
+        """
+        i = self.joint(key)
+        self.local[i] = self.rest[i] @ euler_matrices((x, y, z))
+
+    def bind_actors(self, actors):
+        """
+        Drive actors[i] from joint i; None entries are skipped.
+
+        The actors' user transforms are replaced by user matrices that update()
+        overwrites in place.
+        """
+        self._matrices = []
+        for i, actor in enumerate(actors):
+            if actor is None:
+                continue
+            matrix = vtkMatrix4x4()
+            actor.SetUserTransform(None)
+            actor.SetUserMatrix(matrix)
+            self._matrices.append((i, matrix))
+
+    def bind_instances(self, instances, joints=None):
+        """
+        Drive an InstancedAvatar whose instance i is joint joints[i] (default: joint i).
+        """
+        self._instances.append((instances, joints))
+
+    def update(self):
+        self.world[:] = self.forward()
+        if self._matrices:
+            flat = self.world.reshape(len(self.world), 16)
+            for i, matrix in self._matrices:
+                matrix.DeepCopy(flat[i])
+        for instances, joints in self._instances:
+            instances.matrices[:] = self.world if joints is None else self.world[joints]
+            instances.Modified()
+        return self.world
+
+    @classmethod
+    def from_transforms(cls, transforms, names=None):
+        """
+        Build a skeleton from vtkTransforms chained with SetInput(parent).
+
+        The parents must be in `transforms` or have no input themselves; the
+        local transform of each joint is its matrix relative to the parent's.
+        """
+        if names is None:
+            names = [str(i) for i in range(len(transforms))]
+        position = {id(t): i for i, t in enumerate(transforms)}
+        parents = []
+        for t in transforms:
+            parent = t.GetInput()
+            if parent is None:
+                parents.append(-1)
+            elif id(parent) in position:
+                parents.append(position[id(parent)])
+            else:
+                raise ValueError("parent transform is not part of the skeleton")
+
+        world = np.array([vtk_matrix_to_numpy(t.GetMatrix()) for t in transforms])
+        parents = np.asarray(parents, dtype=np.int32)
+        local = world.copy()
+        child = parents >= 0
+        local[child] = np.linalg.inv(world[parents[child]]) @ world[child]
+        return cls(names, parents, local)
+
+
+def evaluate_clip(skeleton, rotations, return_positions=False, return_bones=False):
+    """
+    Evaluate a whole motion clip in one vectorized pass.
+
+    `rotations` holds per-frame joint rotations relative to the rest pose,
+    either as (F, N, 3) Euler angles in degrees (as in Skeleton.set_rotation)
+    or as (F, N, 3, 3) rotation matrices. Returns the (F, N, 4, 4) world
+    matrices and, if requested, the (F, N, 3) joint positions and the
+    (F, B, 2, 3) bone endpoints for the parent/child pairs in skeleton.bones.
+    """
+    rotations = np.asarray(rotations, dtype=float)
+    if rotations.shape[-1] == 3 and rotations.ndim == 3:
+        rotationMatrices = euler_matrices(rotations)
+    elif rotations.shape[-2:] == (3, 3):
+        rotationMatrices = np.zeros(rotations.shape[:-2] + (4, 4))
+        rotationMatrices[..., :3, :3] = rotations
+        rotationMatrices[..., 3, 3] = 1.0
+    else:
+        raise ValueError("rotations must be (F, N, 3) angles or (F, N, 3, 3) matrices")
+    if rotationMatrices.shape[1] != len(skeleton):
+        raise ValueError("rotations are for %d joints, skeleton has %d" % (rotationMatrices.shape[1], len(skeleton)))
+
+    world = skeleton.forward(skeleton.rest @ rotationMatrices)
+    if not (return_positions or return_bones):
+        return world
+
+    result = [world]
+    positions = world[..., :3, 3]
+    if return_positions:
+        result.append(positions)
+    if return_bones:
+        result.append(positions[:, skeleton.bones])
+    return tuple(result)
+
+
+# Record layout of the compiled skeleton cache (one record per joint)
+SHAPE_PARAMETERS = {
+    "sphere": ("radius",),
+    "cylinder": ("radius", "height", "resolution"),
+    "cube": ("xlength", "ylength", "zlength"),
+}
+SKELETON_DTYPE = np.dtype(
+    [
+        ("name", "U64"),
+        ("parent", "<i4"),
+        ("local", "<f8", (4, 4)),
+        ("shape", "U16"),
+        ("params", "<f8", (3,)),
+        ("color", "<f8", (3,)),
+    ]
+)
+
+
+def compile_skeleton(definition):
+    """
+    Convert a parsed skeleton definition into a SKELETON_DTYPE record array.
+    """
+    joints = definition["joints"]
+    table = np.zeros(len(joints), dtype=SKELETON_DTYPE)
+    index = {joint["name"]: i for i, joint in enumerate(joints)}
+    for i, joint in enumerate(joints):
+        table["name"][i] = joint["name"]
+        parent = joint.get("parent")
+        table["parent"][i] = -1 if parent is None else index[parent]
+        shape = joint.get("shape")
+        if shape:
+            table["shape"][i] = shape["type"]
+            names = SHAPE_PARAMETERS[shape["type"]]
+            table["params"][i, : len(names)] = [shape[name] for name in names]
+        table["color"][i] = joint.get("color", (0.5, 0.5, 0.5))
+
+    table["local"] = transform_matrices(
+        [joint.get("translate", (0.0, 0.0, 0.0)) for joint in joints],
+        [joint.get("rotate", (0.0, 0.0, 0.0)) for joint in joints],
+        [joint.get("scale", (1.0, 1.0, 1.0)) for joint in joints],
+    )
+    return table
+
+
+def skeleton_cache_path(path):
+    return os.path.splitext(path)[0] + ".skel.npy"
+
+
+def load_skeleton_table(path):
+    """
+    Load the compiled record array for a JSON skeleton definition.
+
+    The first load writes <name>.skel.npy next to the JSON file; later loads
+    memory-map it as long as it is newer than the JSON file.
+    """
+    cachePath = skeleton_cache_path(path)
+    try:
+        if os.path.getmtime(cachePath) >= os.path.getmtime(path):
+            table = np.load(cachePath, mmap_mode="r")
+            if table.dtype == SKELETON_DTYPE:
+                return table
+    except (OSError, ValueError):
+        pass
+
+    with open(path) as f:
+        table = compile_skeleton(json.load(f))
+    try:
+        temporaryPath = cachePath + ".tmp"
+        with open(temporaryPath, "wb") as f:
+            np.save(f, table)
+        os.replace(temporaryPath, cachePath)
+    except OSError:
+        # A read-only location only costs the cache, not the load
+        pass
+    return table
+
+
+def load_skeleton(path):
+    """
+    Return (skeleton, table) for a JSON skeleton definition.
+
+    `table` holds the shape type, shape parameters and color of every joint.
+    """
+    table = load_skeleton_table(path)
+    return Skeleton(table["name"], table["parent"], table["local"]), table
@@ -31,10 +31,10 @@ from vtkmodules.vtkRenderingCore import (
     vtkRenderer,
 )
 
+import render_stats
 
-def main(argv):
-    colors = vtkNamedColors()
 
+def create_cone_renderer(colors):
     #
     # Next we create an instance of vtkConeSource and set some of its
     # properties. The instance of vtkConeSource 'cone' is part of a
@@ -77,34 +77,10 @@ def main(argv):
     ren1.AddActor(coneActor)
     ren1.SetBackground(colors.GetColor3d("MidnightBlue"))
 
-    #
-    # Finally we create the render window which will show up on the screen.
-    # We put our renderer into the render window using AddRenderer. We also
-    # set the size to be 300 pixels by 300.
-    #
-    renWin = vtkRenderWindow()
-    renWin.AddRenderer(ren1)
-    renWin.SetSize(300, 300)
-    renWin.SetWindowName("Tutorial_Step6")
+    return ren1, coneActor
 
-    #
-    # The vtkRenderWindowInteractor class watches for events (e.g., keypress,
-    # mouse) in the vtkRenderWindow. These events are translated into
-    # event invocations that VTK understands (see VTK/Common/vtkCommand.h
-    # for all events that VTK processes). Then observers of these VTK
-    # events can process them as appropriate.
-    iren = vtkRenderWindowInteractor()
-    iren.SetRenderWindow(renWin)
-
-    #
-    # By default the vtkRenderWindowInteractor instantiates an instance
-    # of vtkInteractorStyle. vtkInteractorStyle translates a set of events
-    # it observes into operations on the camera, actors, and/or properties
-    # in the vtkRenderWindow associated with the vtkRenderWinodwInteractor.
-    # Here we specify a particular interactor style.
-    style = vtkInteractorStyleTrackballCamera()
-    iren.SetInteractorStyle(style)
 
+def create_box_widget(iren, actor, colors):
     #
     # Here we use a vtkBoxWidget to transform the underlying coneActor (by
     # manipulating its transformation matrix). Many other types of widgets
@@ -125,7 +101,7 @@ def main(argv):
     # initially position and scale the widget. The EndInteractionEvent is
     # observed which invokes the SelectPolygons callback.
     #
-    boxWidget.SetProp3D(coneActor)
+    boxWidget.SetProp3D(actor)
     boxWidget.PlaceWidget()
     callback = vtkMyCallback()
     boxWidget.AddObserver("InteractionEvent", callback)
@@ -136,6 +112,48 @@ def main(argv):
     #
     boxWidget.On()
 
+    return boxWidget
+
+
+def main(argv):
+    colors = vtkNamedColors()
+    ren1, coneActor = create_cone_renderer(colors)
+
+    #
+    # Finally we create the render window which will show up on the screen.
+    # We put our renderer into the render window using AddRenderer. We also
+    # set the size to be 300 pixels by 300.
+    #
+    renWin = vtkRenderWindow()
+    renWin.AddRenderer(ren1)
+    renWin.SetSize(300, 300)
+    renWin.SetWindowName("Tutorial_Step6")
+
+    #
+    # The vtkRenderWindowInteractor class watches for events (e.g., keypress,
+    # mouse) in the vtkRenderWindow. These events are translated into
+    # event invocations that VTK understands (see VTK/Common/vtkCommand.h
+    # for all events that VTK processes). Then observers of these VTK
+    # events can process them as appropriate.
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(renWin)
+
+    #
+    # By default the vtkRenderWindowInteractor instantiates an instance
+    # of vtkInteractorStyle. vtkInteractorStyle translates a set of events
+    # it observes into operations on the camera, actors, and/or properties
+    # in the vtkRenderWindow associated with the vtkRenderWinodwInteractor.
+    # Here we specify a particular interactor style.
+    style = vtkInteractorStyleTrackballCamera()
+    iren.SetInteractorStyle(style)
+
+    boxWidget = create_box_widget(iren, coneActor, colors)
+
+    #
+    # Time every render when RENDER_STATS is set or --render-stats is passed.
+    #
+    render_stats.attach(renWin, argv)
+
     #
     # Start the event loop.
     #
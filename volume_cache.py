@@ -0,0 +1,155 @@
+"""
+Content-addressed on-disk cache of sampled volumes.
+
+A volume is stored as <key>.npy, where the key is a hash of everything that
+determines its contents (function type and parameters, sample dimensions,
+bounds, dtype, ...). Loads memory-map the file, so a warm start costs no
+sampling and no reads beyond the pages that are touched. The cache is
+bounded in size; the least recently used files are evicted first.
+
+The directory defaults to ~/.cache/vtk_volumes and can be changed with
+VOLUME_CACHE_DIR; VOLUME_CACHE_SIZE sets the limit in bytes and
+VOLUME_CACHE=off disables the default cache.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "vtk_volumes")
+DEFAULT_MAX_BYTES = 2 << 30
+
+_default = None
+
+
+def volume_key(**params):
+    """
+    Stable hex digest of the keyword parameters (JSON-serializable values).
+    """
+    text = json.dumps(params, sort_keys=True, default=lambda value: np.asarray(value).tolist())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VolumeCache(object):
+    """
+    Directory of .npy volumes with LRU eviction by total size.
+
+    Recency is tracked in the file modification times, which load() bumps,
+    so it survives restarts and does not depend on atime support.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, maxBytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def load(self, key):
+        """
+        Memory-mapped array for key, or None.
+
+        The map is copy-on-write, so consumers that modify the array in
+        place never write back to the cache.
+        """
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode="c")
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array
+
+    def store(self, key, array):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        temporaryPath = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(temporaryPath, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temporaryPath, path)
+        except OSError:
+            # A full or read-only disk only costs the cache entry
+            try:
+                os.remove(temporaryPath)
+            except OSError:
+                pass
+            return
+        self.evict(keep=path)
+
+    def get(self, key, compute):
+        """
+        Cached array for key, computing and storing it on a miss.
+        """
+        array = self.load(key)
+        if array is None:
+            array = compute()
+            self.store(key, array)
+        return array
+
+    def entries(self):
+        """
+        (mtime, size, path) of every cached volume, least recently used first.
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # Open memory maps of an evicted file stay valid on POSIX
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def default_cache():
+    """
+    Shared cache configured from the environment, or None when disabled.
+    """
+    global _default
+    if os.environ.get("VOLUME_CACHE", "").lower() in ("0", "off", "no", "false"):
+        return None
+    if _default is None:
+        _default = VolumeCache(
+            os.environ.get("VOLUME_CACHE_DIR", DEFAULT_DIRECTORY),
+            int(os.environ.get("VOLUME_CACHE_SIZE", DEFAULT_MAX_BYTES)),
+        )
+    return _default
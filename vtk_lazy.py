@@ -0,0 +1,40 @@
+"""
+Lazy stand-in for `import vtk`.
+
+`import vtk` loads every VTK module (about two seconds cold), although a
+script only needs the handful that define the classes it uses.
+`import vtk_lazy as vtk` keeps the `vtk.vtkTransform()` spelling but, through
+a module __getattr__ (PEP 562), imports only the vtkmodules module that
+defines a class, the first time the class is used. Names that are not in
+CLASS_MODULES fall back to vtkmodules.all, i.e. to the old cost.
+"""
+
+import importlib
+
+# Class -> the vtkmodules module defining it, for the classes used via `vtk.`
+CLASS_MODULES = {
+    "vtkActor": "vtkmodules.vtkRenderingCore",
+    "vtkCylinderSource": "vtkmodules.vtkFiltersSources",
+    "vtkMatrix4x4": "vtkmodules.vtkCommonMath",
+    "vtkPolyDataMapper": "vtkmodules.vtkRenderingCore",
+    "vtkTransform": "vtkmodules.vtkCommonTransforms",
+}
+
+
+def __getattr__(name):
+    moduleName = CLASS_MODULES.get(name)
+    if moduleName is None:
+        if not name.startswith("vtk"):
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+        moduleName = "vtkmodules.all"
+    try:
+        value = getattr(importlib.import_module(moduleName), name)
+    except AttributeError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name)) from None
+    # Later lookups find the class directly and skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(CLASS_MODULES))